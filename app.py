@@ -1,16 +1,35 @@
 import sys
 import os
+import time
+from collections import deque
+from functools import wraps
 from pathlib import Path
 import streamlit as st
 
+# Wall-clock start of this script run, for the rerun timings
+RUN_START = time.perf_counter()
+
 # --- 2. SETUP PATHS ---
 current_file = Path(__file__).resolve()
 PROJECT_ROOT = current_file.parent
 if str(PROJECT_ROOT) not in sys.path:
     sys.path.append(str(PROJECT_ROOT))
 
-from scripts.db_manager import DBManager  # noqa: E402
-from scripts.build_exam import generate_exam, render_node_preview  # noqa: E402
+from scripts.job_queue import JobQueue  # noqa: E402
+from scripts.shared_db import SharedDB  # noqa: E402
+from scripts.build_exam import (  # noqa: E402
+    generate_exam,
+    preview_bundle,
+    render_preview,
+)
+from scripts.models import (  # noqa: E402
+    Definition,
+    Example,
+    Lecture,
+    Mistake,
+    Tool,
+    Tutorial,
+)
 
 # --- 1. PAGE CONFIG ---
 st.set_page_config(layout="wide", page_title="Math Exam System", page_icon="📐")
@@ -25,125 +44,302 @@ if "pdf_ready" not in st.session_state:
     st.session_state.pdf_ready = None
 if "key_ready" not in st.session_state:
     st.session_state.key_ready = None
+if "qb_page" not in st.session_state:
+    st.session_state.qb_page = 1
+
+# Question Bank paging: only one page of rows (4 widgets each) is rendered,
+# so a rerun costs the same for 50 or 50k questions
+PAGE_SIZES = [10, 25, 50, 100]
+SORT_LABELS = {"ID": "id", "Topic": "topic", "Year": "year"}
+
+# Compiles and previews run as background jobs. Their progress and results
+# are shown by small fragments that rerun themselves at this interval, so
+# polling never reruns the rest of the app.
+POLL_INTERVAL_S = 0.5
+# Every compile job builds in its own build/jobs/<job id>/ directory (inside
+# the project root, where Typst resolves "/src/lib.typ")
+JOBS_DIR = PROJECT_ROOT / "build" / "jobs"
+
+# Rerun timings: full script runs vs. fragment runs, newest last. Set
+# APP_TIMINGS=1 to also print every measurement to the console.
+TIMING_HISTORY = 20
+if "rerun_timings" not in st.session_state:
+    st.session_state.rerun_timings = deque(maxlen=TIMING_HISTORY)
+
+
+def record_timing(scope, seconds):
+    st.session_state.rerun_timings.append((scope, seconds))
+    if os.environ.get("APP_TIMINGS"):
+        print(f"[INFO] Rerun of {scope}: {seconds * 1000:.1f} ms")
+
+
+def timed(scope):
+    """Records how long each run of a pane takes (shown in the sidebar)."""
+
+    def decorator(fn):
+        @wraps(fn)
+        def run(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record_timing(scope, time.perf_counter() - start)
+
+        return run
+
+    return decorator
 
 
 # --- 4. DATA LOADING ---
-@st.cache_data
-def get_db():
+@st.cache_resource
+def get_shared_db():
+    """One bank for every session; edits to data/ are reloaded by a file watcher."""
     data_path = PROJECT_ROOT / "data"
     if not data_path.exists():
         return None
-    return DBManager(data_path)
+    return SharedDB(data_path)
+
 
+@st.cache_resource
+def get_job_queue():
+    """One bounded job pool for every session, so typst load stays capped."""
+    return JobQueue(workspace_root=JOBS_DIR)
 
-db = get_db()
-if not db:
+
+job_queue = get_job_queue()
+shared_db = get_shared_db()
+if not shared_db:
     st.error("Data directory not found!")
     st.stop()
 
 # --- 5. SIDEBAR ---
 st.sidebar.title("🎛️ Controls")
-st.sidebar.info(f"Loaded {len(db.questions)} Questions.")
+with shared_db.read() as db:
+    question_count = len(db.questions)
+st.sidebar.info(f"Loaded {question_count} Questions.")
 if st.sidebar.button("Refresh Database"):
-    st.cache_data.clear()
+    shared_db.reload()
     st.rerun()
+with st.sidebar.expander("⏱️ Rerun timings"):
+    # Panes are fragments: clicking inside one reruns only that pane
+    st.caption("Updated on full reruns; newest last.")
+    st.table(
+        [
+            {"scope": scope, "ms": round(seconds * 1000, 1)}
+            for scope, seconds in st.session_state.rerun_timings
+        ]
+    )
 
 
-# --- 6. PREVIEW HELPER ---
-def show_preview(node):
-    with st.spinner(f"Generating preview for {node.id}..."):
-        img_path, error_msg = render_node_preview(node)
-        if img_path:
-            st.session_state.last_preview = img_path
-        else:
-            st.error(f"Rendering failed:\n{error_msg}")
+# --- 6. JOB & PREVIEW HELPERS ---
+def job_status(state_key):
+    """The job whose id is stored under ``state_key``; forgotten once finished."""
+    job_id = st.session_state.get(state_key)
+    job = job_queue.status(job_id) if job_id else None
+    if job is None or job.finished:
+        st.session_state.pop(state_key, None)
+    return job
+
+
+def show_notice(state_key):
+    """Shows the last job outcome, which stays until the next job is queued."""
+    notice = st.session_state.get(f"{state_key}_notice")
+    if notice:
+        kind, text = notice
+        getattr(st, kind)(text)
+
+
+def _compile_exam(ids, snapshot, progress, workspace):
+    """
+    Builds the exam from ``snapshot`` (see DBManager.subset) in the job's
+    workspace and returns the two PDFs' bytes.
+    """
+    path_std, path_key = generate_exam(
+        filename="exam",
+        specific_ids=ids,
+        db=snapshot,
+        progress=progress,
+        out_dir=workspace,
+    )
+    if not (path_std and path_key):
+        return None
+    # Bytes, not paths: downloads keep working after the workspace is cleaned up
+    return path_std.read_bytes(), path_key.read_bytes()
 
 
-# --- 7. TABS ---
-tab1, tab2 = st.tabs(["📝 Exam Builder", "📚 Knowledge Base"])
+def _render_preview(node, progress):
+    # The lock only covers reading the bank, not the (possibly slow) compile
+    with shared_db.read() as db:
+        bundle = preview_bundle(node, db)
+    return render_preview(node, bundle)
 
-# === TAB 1: EXAM BUILDER ===
-with tab1:
-    col_left, col_right = st.columns([0.6, 0.4])
 
-    with col_left:
-        st.subheader("Question Bank")
-        filter_topic = st.text_input("🔍 Filter by Topic", "")
-
-        candidates = list(db.questions.values())
-        if filter_topic:
-            candidates = [
-                q for q in candidates if filter_topic.lower() in (q.topic or "").lower()
-            ]
-
-        with st.container(height=500):
-            for q in candidates:
-                c1, c2, c3 = st.columns([0.1, 0.7, 0.2])
-
-                is_selected = q.id in st.session_state.selected_questions
-                if c1.checkbox(
-                    "Sel",
-                    key=f"chk_{q.id}",
-                    value=is_selected,
-                    label_visibility="collapsed",
-                ):
-                    if q.id not in st.session_state.selected_questions:
-                        st.session_state.selected_questions.append(q.id)
-                else:
-                    if q.id in st.session_state.selected_questions:
-                        st.session_state.selected_questions.remove(q.id)
-
-                c2.markdown(f"**{q.topic}** ({q.year or 'N/A'})  \n`{q.id}`")
-
-                if c3.button("👁️", key=f"btn_prev_{q.id}"):
-                    show_preview(q)
-                st.divider()
+def show_preview(node, state_key):
+    """Queues a preview of ``node``; preview_pane(state_key) picks it up."""
+    st.session_state.pop(f"{state_key}_notice", None)
+    st.session_state[state_key] = job_queue.submit(
+        "preview", _render_preview, node, key=("preview", node.id, repr(node))
+    )
 
-    with col_right:
-        st.subheader("Your Exam")
-        if not st.session_state.selected_questions:
+
+def toggle_question(qid):
+    """Checkbox callback: selection lives in session state, not in the widgets."""
+    selected = st.session_state.selected_questions
+    if qid in selected:
+        selected.remove(qid)
+    else:
+        selected.append(qid)
+
+
+def request_jump():
+    # Only a newly entered id moves the page; paging away afterwards still works
+    st.session_state.qb_jump_pending = True
+
+
+# --- 7. PANES ---
+# Each pane is a fragment, so a click inside it reruns just that pane. Job
+# results are shown by separate polling fragments (exam_status, preview_pane):
+# a click only queues the job, and the polling fragment picks it up.
+@st.fragment
+@timed("Your Exam")
+def exam_pane():
+    st.subheader("Your Exam")
+    if st.button("🚀 Compile Exam & Key"):
+        # Read at click time: the selection is edited in the Question Bank pane
+        selected = list(st.session_state.selected_questions)
+        if not selected:
             st.info("No questions selected.")
         else:
-            st.write(
-                f"Selected **{len(st.session_state.selected_questions)}** questions."
+            st.session_state.pop("exam_job_notice", None)
+            # Just the exam's nodes, so the lock is not held for the compile
+            with shared_db.read() as db:
+                snapshot = db.subset(selected)
+            st.session_state.exam_job = job_queue.submit(
+                "exam",
+                _compile_exam,
+                selected,
+                snapshot,
+                key=("exam", tuple(selected)),
+                workspace=True,
             )
-            with st.expander("View Selected IDs"):
-                st.write(st.session_state.selected_questions)
-
-            if st.button("🚀 Compile Exam & Key"):
-                with st.spinner("Compiling PDF..."):
-                    path_std, path_key = generate_exam(
-                        filename="final_exam",
-                        specific_ids=st.session_state.selected_questions,
-                    )
-                    if path_std and path_key:
-                        st.session_state.pdf_ready = str(path_std)
-                        st.session_state.key_ready = str(path_key)
-                        st.success("Success!")
-
-            if st.session_state.pdf_ready:
-                with open(st.session_state.pdf_ready, "rb") as f:
-                    st.download_button(
-                        "📄 Download Exam", f, "Exam.pdf", "application/pdf"
-                    )
-            if st.session_state.key_ready:
-                with open(st.session_state.key_ready, "rb") as f:
-                    st.download_button(
-                        "🔑 Download Key", f, "Key.pdf", "application/pdf"
-                    )
-
-        st.subheader("Live Preview")
-        if st.session_state.last_preview and os.path.exists(
-            st.session_state.last_preview
-        ):
-            st.image(
-                st.session_state.last_preview
-            )  # Removed use_container_width to fix warning
 
-# === TAB 2: KNOWLEDGE BASE ===
-with tab2:
-    st.markdown("### 📖 Knowledge Base Explorer")
 
+# Polling fragments are not timed: their idle reruns would crowd the table
+@st.fragment(run_every=POLL_INTERVAL_S)
+def exam_status():
+    """Progress of the compile job, then its outcome and the downloads."""
+    job = job_status("exam_job")
+    if job is not None and not job.finished:
+        st.progress(job.progress, text=f"Compiling PDF... {job.message}")
+    elif job is not None:
+        if job.result:
+            st.session_state.pdf_ready, st.session_state.key_ready = job.result
+            st.session_state.exam_job_notice = ("success", "Success!")
+        else:
+            error = f"Compile failed: {job.error or 'see the server log.'}"
+            st.session_state.exam_job_notice = ("error", error)
+    show_notice("exam_job")
+
+    b1, b2 = st.columns(2)
+    if st.session_state.pdf_ready:
+        b1.download_button(
+            "📄 Download Exam",
+            st.session_state.pdf_ready,
+            "Exam.pdf",
+            "application/pdf",
+        )
+    if st.session_state.key_ready:
+        b2.download_button(
+            "🔑 Download Key",
+            st.session_state.key_ready,
+            "Key.pdf",
+            "application/pdf",
+        )
+
+
+@st.fragment(run_every=POLL_INTERVAL_S)
+def preview_pane(state_key, title):
+    """The latest preview, collecting the job under ``state_key`` once it finished."""
+    st.subheader(title)
+    job = job_status(state_key)
+    if job is not None and not job.finished:
+        st.caption(f"⏳ Generating preview ({job.status})...")
+    elif job is not None:
+        img_path, error_msg = job.result or (None, job.error)
+        if img_path:
+            st.session_state.last_preview = img_path
+        else:
+            notice = ("error", f"Rendering failed:\n{error_msg}")
+            st.session_state[f"{state_key}_notice"] = notice
+    show_notice(state_key)
+
+    if st.session_state.last_preview and os.path.exists(st.session_state.last_preview):
+        st.image(st.session_state.last_preview)
+
+
+@st.fragment
+@timed("Question Bank")
+def question_bank_pane():
+    st.subheader("Question Bank")
+    filter_topic = st.text_input("🔍 Filter by Topic", "")
+    o1, o2, o3 = st.columns([0.35, 0.25, 0.4])
+    sort_label = o1.radio("Sort by", list(SORT_LABELS), horizontal=True)
+    page_size = o2.selectbox("Per page", PAGE_SIZES, index=1)
+    jump_id = o3.text_input("Jump to ID", key="qb_jump", on_change=request_jump)
+    jump_id = jump_id.strip()
+
+    with shared_db.read() as db:
+        candidates = db.query_questions(
+            topic=filter_topic, sort=SORT_LABELS[sort_label]
+        )
+
+    page_count = max(1, -(-len(candidates) // page_size))
+    if st.session_state.pop("qb_jump_pending", False) and jump_id:
+        position = next((i for i, q in enumerate(candidates) if q.id == jump_id), None)
+        if position is None:
+            st.warning(f"`{jump_id}` is not in the filtered list.")
+        else:
+            st.session_state.qb_page = position // page_size + 1
+    # Filters and page size change the page count; keep the page in range
+    st.session_state.qb_page = min(st.session_state.qb_page, page_count)
+
+    p1, p2 = st.columns([0.3, 0.7])
+    page = p1.number_input(
+        "Page", min_value=1, max_value=page_count, step=1, key="qb_page"
+    )
+    p2.caption(
+        f"{len(candidates)} questions, page {page} of {page_count} "
+        f"({len(st.session_state.selected_questions)} selected)"
+    )
+
+    start = (page - 1) * page_size
+    with st.container(height=500):
+        for q in candidates[start : start + page_size]:
+            c1, c2, c3 = st.columns([0.1, 0.7, 0.2])
+
+            c1.checkbox(
+                "Sel",
+                key=f"chk_{q.id}",
+                value=q.id in st.session_state.selected_questions,
+                on_change=toggle_question,
+                args=(q.id,),
+                label_visibility="collapsed",
+            )
+
+            marker = "➡️ " if q.id == jump_id else ""
+            c2.markdown(f"{marker}**{q.topic}** ({q.year or 'N/A'})  \n`{q.id}`")
+
+            if c3.button("👁️", key=f"btn_prev_{q.id}"):
+                show_preview(q, "qb_preview_job")
+            st.divider()
+
+    with st.expander("View Selected IDs"):
+        st.write(st.session_state.selected_questions)
+
+
+@st.fragment
+@timed("Knowledge Base")
+def knowledge_base_pane():
     # NEW: Expanded Categories
     kb_type = st.radio(
         "Select Category:",
@@ -151,45 +347,60 @@ with tab2:
         horizontal=True,
     )
 
-    items = []
-    if kb_type == "Definitions":
-        items = list(db.definitions.values())
-    elif kb_type == "Tools":
-        items = list(db.tools.values())
-    elif kb_type == "Mistakes":
-        items = list(db.mistakes.values())
-    elif kb_type == "Examples":
-        items = list(db.examples.values())
-    elif kb_type == "Lectures":
-        items = list(db.lectures.values())
-    elif kb_type == "Tutorials":
-        items = list(db.tutorials.values())
+    kb_storage = {
+        "Definitions": ("definitions", Definition),
+        "Tools": ("tools", Tool),
+        "Mistakes": ("mistakes", Mistake),
+        "Examples": ("examples", Example),
+        "Lectures": ("lectures", Lecture),
+        "Tutorials": ("tutorials", Tutorial),
+    }
+    storage_name, node_class = kb_storage[kb_type]
 
     kb_search = st.text_input("Filter Items", "")
-    if kb_search:
-        items = [i for i in items if kb_search.lower() in str(i.__dict__).lower()]
+    with shared_db.read() as db:
+        if kb_search:
+            # Ranked, prefix-matching lookup in the full-text index
+            items = db.search(kb_search, node_type=node_class)
+        else:
+            items = list(getattr(db, storage_name).values())
 
-    k_col1, k_col2 = st.columns([0.5, 0.5])
+    st.caption(f"Found {len(items)} items")
+    with st.container(height=600):
+        for item in items:
+            label = getattr(
+                item, "name", getattr(item, "title", getattr(item, "term", item.id))
+            )
 
-    with k_col1:
-        st.caption(f"Found {len(items)} items")
-        with st.container(height=600):
-            for item in items:
-                label = getattr(
-                    item, "name", getattr(item, "title", getattr(item, "term", item.id))
-                )
+            kc1, kc2 = st.columns([0.8, 0.2])
+            kc1.markdown(f"**{item.id}**")
+            kc1.caption(f"{str(label)[:60]}...")
+
+            if kc2.button("👁️", key=f"kb_prev_{item.id}"):
+                show_preview(item, "kb_preview_job")
+            st.divider()
 
-                kc1, kc2 = st.columns([0.8, 0.2])
-                kc1.markdown(f"**{item.id}**")
-                kc1.caption(f"{str(label)[:60]}...")
 
-                if kc2.button("👁️", key=f"kb_prev_{item.id}"):
-                    show_preview(item)
-                st.divider()
+# --- 8. TABS ---
+tab1, tab2 = st.tabs(["📝 Exam Builder", "📚 Knowledge Base"])
 
+# === TAB 1: EXAM BUILDER ===
+with tab1:
+    exam_pane()
+    exam_status()
+    col_left, col_right = st.columns([0.6, 0.4])
+    with col_left:
+        question_bank_pane()
+    with col_right:
+        preview_pane("qb_preview_job", "Live Preview")
+
+# === TAB 2: KNOWLEDGE BASE ===
+with tab2:
+    st.markdown("### 📖 Knowledge Base Explorer")
+    k_col1, k_col2 = st.columns([0.5, 0.5])
+    with k_col1:
+        knowledge_base_pane()
     with k_col2:
-        st.subheader("Rendered View")
-        if st.session_state.last_preview and os.path.exists(
-            st.session_state.last_preview
-        ):
-            st.image(st.session_state.last_preview)
+        preview_pane("kb_preview_job", "Rendered View")
+
+record_timing("full app", time.perf_counter() - RUN_START)
@@ -1,6 +1,16 @@
+import atexit
+import hashlib
+import json
+import math
+import os
 import random
+import re
+import shutil
 import subprocess
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
 # --- 1. SETUP PATHS ---
@@ -9,7 +19,11 @@ CURRENT_DIR = Path(__file__).resolve().parent
 PROJECT_ROOT = CURRENT_DIR.parent
 sys.path.append(str(PROJECT_ROOT))
 
-from scripts.db_manager import DBManager  # noqa: E402
+from scripts.db_manager import (  # noqa: E402
+    BUNDLE_COLLECTIONS,
+    DBManager,
+    node_to_dict,
+)
 from scripts.models import (  # noqa: E402
     Question,
     Definition,
@@ -46,9 +60,292 @@ TEMPLATE = """
 
 
 # --- 3. PREVIEW RENDERER ---
-def render_node_preview(node):
+PREVIEW_HEADER = """
+    #import "/src/lib.typ": *
+    #show_solutions.update(true) 
+    #set page(width: 14cm, height: auto, margin: 0.5cm, header: none, footer: none)
+    #set text(font: "Times New Roman", size: 11pt)
+    """
+
+# Reuse one long-lived `typst watch` process for previews instead of paying
+# process start-up and a full KB load on every click.
+USE_PREVIEW_WATCHER = True
+WATCH_TIMEOUT = 30  # seconds to wait for a recompile before giving up
+
+# Rendered previews are cached by content hash; oldest files go first once
+# temp_previews grows past this size.
+PREVIEW_CACHE_BYTES = 200 * 1024 * 1024
+PREVIEW_DEPENDENCIES = ["src/lib.typ", "src/utils.typ"]
+
+# Per-process cap on one-shot typst processes, shared by every thread in it
+# (app sessions, background jobs, compile_all pools); extra compiles wait
+# here. Separate processes (e.g. a CLI build next to the app) each get one.
+MAX_TYPST_PROCESSES = max(2, os.cpu_count() or 2)  # An exam is a pair of compiles
+_typst_slots = threading.BoundedSemaphore(MAX_TYPST_PROCESSES)
+
+ANSI_ESCAPE = re.compile(r"\x1b\[[0-9;?]*[A-Za-z]")
+
+
+class WatcherError(Exception):
+    """The watch process died or stopped responding; use a one-shot compile."""
+
+
+class TypstWatcher:
+    """
+    Drives a `typst watch` process compiling a fixed preview source to PNG.
+
+    Rewriting the source makes Typst recompile incrementally with its
+    caches (fonts, parsed lib.typ, loaded YAML) still warm. Typst reports
+    each compile on stderr ("compiled successfully ...", "compiled with
+    errors" followed by the diagnostics), which is how render() knows the
+    output is ready.
+    """
+
+    def __init__(self, work_dir: Path):
+        self.source = work_dir / "_watch.typ"
+        self.output = work_dir / "_watch.png"
+        self._lock = threading.Lock()
+        self._cond = threading.Condition()
+        self._lines = []
+        self._statuses = []  # One entry per finished compile
+        self._last_source = None
+        self._proc = None
+
+    def start(self):
+        with open(self.source, "w", encoding="utf-8") as f:
+            f.write(PREVIEW_HEADER)
+        self._proc = subprocess.Popen(
+            [
+                "typst",
+                "watch",
+                "--root",
+                str(PROJECT_ROOT),
+                "--format",
+                "png",
+                "--ppi",
+                "144",
+                str(self.source),
+                str(self.output),
+            ],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+        )
+        threading.Thread(target=self._pump, daemon=True).start()
+        # The initial compile loads lib.typ and the KB; wait for it once
+        self._wait_for_status(0)
+
+    def alive(self):
+        return self._proc is not None and self._proc.poll() is None
+
+    def stop(self):
+        if self.alive():
+            self._proc.terminate()
+            try:
+                self._proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self._proc.kill()
+
+    def _pump(self):
+        for raw in self._proc.stderr:
+            line = ANSI_ESCAPE.sub("", raw).rstrip()
+            with self._cond:
+                self._lines.append(line)
+                if "compiled successfully" in line or "compiled with warnings" in line:
+                    self._statuses.append((True, len(self._lines)))
+                elif "compiled with errors" in line:
+                    self._statuses.append((False, len(self._lines)))
+                self._cond.notify_all()
+        with self._cond:
+            self._cond.notify_all()
+
+    def _wait_for_status(self, seen):
+        """Blocks until more than ``seen`` compiles have finished."""
+        with self._cond:
+            ok = self._cond.wait_for(
+                lambda: len(self._statuses) > seen or not self.alive(),
+                timeout=WATCH_TIMEOUT,
+            )
+            if not ok or len(self._statuses) <= seen:
+                raise WatcherError("typst watch did not report a compile")
+            return self._statuses[seen]
+
+    def _diagnostics(self, start):
+        """Collects the error lines printed after a failed compile."""
+        deadline = time.monotonic() + 1.0
+        with self._cond:
+            # Diagnostics follow the status line; wait until the stream goes quiet
+            while time.monotonic() < deadline:
+                count = len(self._lines)
+                self._cond.wait(timeout=0.1)
+                if len(self._lines) == count:
+                    break
+            return "\n".join(self._lines[start:]).strip()
+
+    def render(self, typ_content, img_file: Path):
+        """Compiles ``typ_content`` and copies the PNG to ``img_file``.
+
+        Returns an error message, or None on success.
+        """
+        with self._lock:
+            if not self.alive():
+                raise WatcherError("typst watch is not running")
+
+            if typ_content != self._last_source:
+                with self._cond:
+                    seen = len(self._statuses)
+                # Single in-place write: Typst watches the file, not the directory
+                with open(self.source, "w", encoding="utf-8") as f:
+                    f.write(typ_content)
+                self._last_source = typ_content
+
+                ok, line_no = self._wait_for_status(seen)
+                if not ok:
+                    self._last_source = None  # Retry on the next click
+                    return f"Typst Error:\n{self._diagnostics(line_no)}"
+
+            shutil.copyfile(self.output, img_file)
+            return None
+
+
+_watcher = None
+_watcher_lock = threading.Lock()
+_watcher_unavailable = False
+
+
+def _get_preview_watcher(preview_dir: Path):
+    """Returns the shared watcher, starting it on first use (None if unavailable)."""
+    global _watcher, _watcher_unavailable
+    with _watcher_lock:
+        if not USE_PREVIEW_WATCHER or _watcher_unavailable:
+            return None
+        if _watcher is not None and _watcher.alive():
+            return _watcher
+        watcher = TypstWatcher(preview_dir)
+        try:
+            watcher.start()
+        except (OSError, WatcherError) as e:
+            watcher.stop()
+            # No typst on PATH (or no watch support): stop trying for this process
+            print(f"[WARN] Preview watcher unavailable, compiling one-shot: {e}")
+            _watcher_unavailable = True
+            return None
+        _watcher = watcher
+        return _watcher
+
+
+@atexit.register
+def _stop_preview_watcher():
+    if _watcher is not None:
+        _watcher.stop()
+
+
+def _data_fingerprint():
+    """Size and mtime of the data/*.yaml files that compiles without a bundle read."""
+    parts = []
+    for name in BUNDLE_COLLECTIONS:
+        try:
+            st = (PROJECT_ROOT / "data" / f"{name}.yaml").stat()
+            parts.append(f"{name}:{st.st_size}:{st.st_mtime_ns}")
+        except OSError:
+            parts.append(f"{name}:<missing>")
+    return "\n".join(parts).encode("utf-8")
+
+
+def _preview_key(node, typ_content, bundle=None, data=None):
+    """
+    Hash of everything the preview image depends on: the node, the source,
+    lib.typ, and the data the compile reads (``bundle``, or else the
+    ``data`` fingerprint of data/*.yaml).
+    """
+    h = hashlib.sha256()
+    h.update(type(node).__name__.encode("utf-8"))
+    h.update(
+        json.dumps(node_to_dict(node), sort_keys=True, default=str).encode("utf-8")
+    )
+    if bundle is not None:
+        # Covers the nodes the preview pulls in, e.g. a tool cited by a question
+        h.update(json.dumps(bundle, sort_keys=True, default=str).encode("utf-8"))
+    else:
+        h.update(data if data is not None else _data_fingerprint())
+    h.update(typ_content.encode("utf-8"))
+    for rel_path in PREVIEW_DEPENDENCIES:
+        try:
+            h.update((PROJECT_ROOT / rel_path).read_bytes())
+        except OSError:
+            h.update(b"<missing>")
+    return h.hexdigest()[:32]
+
+
+def _evict_previews(preview_dir: Path, max_bytes=None):
+    """Deletes least recently used cached PNGs until the cache fits."""
+    max_bytes = PREVIEW_CACHE_BYTES if max_bytes is None else max_bytes
+    entries = []
+    for path in preview_dir.glob("*.png"):
+        if path.name.startswith("_"):
+            continue  # The watcher's working output
+        try:
+            st = path.stat()
+        except OSError:
+            continue
+        entries.append((st.st_mtime_ns, st.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            path.unlink()
+            total -= size
+        except OSError:
+            pass
+
+
+def _keep_preview(preview_dir: Path, img_file: Path, data=None):
+    """
+    Adds a freshly rendered image to the cache. An image rendered from
+    data/*.yaml is dropped if the files changed during the compile, as it
+    may not match the fingerprint in its name.
+    """
+    if data is not None and _data_fingerprint() != data:
+        img_file.unlink(missing_ok=True)
+        return None, "The data files changed while rendering; preview again."
+    _evict_previews(preview_dir)
+    return str(img_file), None
+
+
+def render_node_preview(node, db=None):
     """
     Renders a single node (Question, Def, etc.) to a PNG.
+    Unchanged nodes are served from the content-addressed cache without
+    running Typst. With ``db``, one-shot compiles read a slim bundle of the
+    node and its references instead of the whole knowledge base. The watch
+    process keeps the full KB warm from data/*.yaml instead, so it is only
+    used while those files hold the whole bank (see has_flat_files()).
+    """
+    return render_preview(node, preview_bundle(node, db))
+
+
+def preview_bundle(node, db=None):
+    """
+    The bundle a preview of ``node`` compiles against, or None if Typst can
+    read data/*.yaml (through the watch process). This is the only step of
+    a preview that reads ``db``, so a caller sharing ``db`` between threads
+    only needs to hold its lock around this call, not the compile.
+    """
+    # The watch process reads data/*.yaml, which a sharded, SQLite-backed or
+    # journaled bank does not keep current; those previews use a bundle.
+    flat = db is None or db.has_flat_files()
+    use_watcher = flat and USE_PREVIEW_WATCHER and not _watcher_unavailable
+    return db.bundle([node.id]) if db is not None and not use_watcher else None
+
+
+def render_preview(node, bundle=None):
+    """
+    render_node_preview() with the bundle from preview_bundle(); without
+    one, Typst reads data/*.yaml.
     """
     preview_dir = PROJECT_ROOT / "temp_previews"
     preview_dir.mkdir(exist_ok=True, parents=True)
@@ -72,17 +369,31 @@ def render_node_preview(node):
         return None, f"Node type '{type(node).__name__}' not supported for preview."
 
     # Preview Template: Force solutions ON, simplified page
-    typ_content = f"""
-    #import "/src/lib.typ": *
-    #show_solutions.update(true) 
-    #set page(width: 14cm, height: auto, margin: 0.5cm, header: none, footer: none)
-    #set text(font: "Times New Roman", size: 11pt)
-    
+    typ_content = f"""{PREVIEW_HEADER}
     {typ_call}
     """
 
-    typ_file = preview_dir / f"{node.id}.typ"
-    img_file = preview_dir / f"{node.id}.png"
+    # The cache key covers exactly what the compile reads: the bundle, or the files
+    data = _data_fingerprint() if bundle is None else None
+    key = _preview_key(node, typ_content, bundle, data)
+    # Named by content, so concurrent previews never share a source file
+    typ_file = preview_dir / f"{key}.typ"
+    img_file = preview_dir / f"{key}.png"
+
+    if img_file.exists():
+        os.utime(img_file)  # Mark as recently used
+        return str(img_file), None
+
+    watcher = _get_preview_watcher(preview_dir) if bundle is None else None
+    if watcher is not None:
+        try:
+            error_msg = watcher.render(typ_content, img_file)
+            if error_msg:
+                return None, error_msg
+            return _keep_preview(preview_dir, img_file, data)
+        except (OSError, WatcherError) as e:
+            print(f"[WARN] Preview watcher failed, compiling one-shot: {e}")
+            watcher.stop()
 
     # Write source file
     with open(typ_file, "w", encoding="utf-8") as f:
@@ -90,43 +401,148 @@ def render_node_preview(node):
 
     # Compile
     # CRITICAL: --root must be PROJECT_ROOT for absolute imports like "/src/lib.typ" to work
-    cmd = [
-        "typst",
-        "compile",
-        "--root",
-        str(PROJECT_ROOT),
-        "--format",
-        "png",
-        "--ppi",
-        "144",
-        str(typ_file),
-        str(img_file),
-    ]
+    cmd = ["typst", "compile", "--root", str(PROJECT_ROOT)]
+    if bundle is not None:
+        bundle_file = preview_dir / f"{key}.bundle.json"
+        with open(bundle_file, "w", encoding="utf-8") as f:
+            json.dump(bundle, f, ensure_ascii=False, default=str)
+        cmd += _bundle_input(bundle_file)
+    cmd += ["--format", "png", "--ppi", "144", str(typ_file), str(img_file)]
 
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True, encoding="utf-8")
+        with _typst_slots:
+            result = subprocess.run(
+                cmd, capture_output=True, text=True, encoding="utf-8"
+            )
 
         if result.returncode == 0:
-            return str(img_file), None
+            return _keep_preview(preview_dir, img_file, data)
         else:
             return None, f"Typst Error:\n{result.stderr}"
 
     except Exception as e:
         return None, f"Subprocess Failed: {str(e)}"
+    finally:
+        typ_file.unlink(missing_ok=True)
+        if bundle is not None:
+            bundle_file.unlink(missing_ok=True)
+
+
+# --- 4. PDF COMPILATION ---
+# Each compile is its own typst process, so threads are enough to run them
+# in parallel; the pool size bounds how many run at once.
+MAX_COMPILE_WORKERS = os.cpu_count() or 2
+
+
+def _bundle_input(bundle: Path):
+    """`--input` flag pointing src/lib.typ at a data bundle (root-relative path)."""
+    return [
+        "--input",
+        "bundle=/" + bundle.resolve().relative_to(PROJECT_ROOT).as_posix(),
+    ]
+
 
+def write_bundle(db, ids, path: Path):
+    """Writes the slim data bundle for ``ids`` (see DBManager.bundle)."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(db.bundle(ids), f, ensure_ascii=False, default=str)
+    return path
 
-# --- 4. EXAM GENERATOR ---
-def generate_exam(topic=None, count=3, filename="generated_exam", specific_ids=None):
+
+def typst_compile(source: Path, output: Path, bundle: Path = None):
+    """Runs one `typst compile`. Returns the error output, or None on success."""
+    cmd = ["typst", "compile", "--root", str(PROJECT_ROOT)]
+    try:
+        if bundle is not None:
+            cmd += _bundle_input(bundle)
+        with _typst_slots:
+            result = subprocess.run(
+                cmd + [str(source), str(output)], capture_output=True
+            )
+    except Exception as e:
+        return f"Subprocess Failed: {e}"
+    if result.returncode != 0:
+        return result.stderr.decode("utf-8", errors="replace")
+    return None
+
+
+def compile_all(jobs, max_workers=None, progress=None):
     """
-    Generates PDF pair (Student + Key).
+    Compiles ``(label, source, output, bundle)`` jobs concurrently (``bundle``
+    may be None to load the full knowledge base).
+    Returns ``{label: error}`` for every job that failed (empty on success).
+    ``progress(done, total, label, error)`` is called as each job finishes.
     """
+    jobs = list(jobs)
+    if not jobs:
+        return {}
+    workers = min(len(jobs), max_workers or MAX_COMPILE_WORKERS)
+    errors = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(typst_compile, src, out, bundle): label
+            for label, src, out, bundle in jobs
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            error = future.result()
+            if error:
+                errors[futures[future]] = error
+            if progress:
+                progress(done, len(jobs), futures[future], error)
+    return errors
+
+
+# --- 5. EXAM GENERATOR ---
+def _open_db():
     print(f"[INFO] Initializing DB from {PROJECT_ROOT / 'data'}")
 
     try:
         db = DBManager(PROJECT_ROOT / "data")
     except Exception as e:
         print(f"[ERROR] DB Init Failed: {e}")
-        return None, None
+        return None
+    return db
+
+
+def _topic_candidates(db, topic):
+    return db.query_questions(topic=topic)
+
+
+def _exam_sources(selected, title):
+    """Returns the (student, key) Typst sources for a list of questions."""
+    # Build Body
+    typst_body = ""
+    for i, q in enumerate(selected, 1):
+        typst_body += f'== Question {i}\n#question("{q.id}")\n\n'
+
+    # Passing "false"/"true" (Typst booleans) to the template
+    src_student = TEMPLATE.format(title=title, content=typst_body, show_sol="false")
+    src_teacher = TEMPLATE.format(
+        title=f"{title} (KEY)", content=typst_body, show_sol="true"
+    )
+    return src_student, src_teacher
+
+
+def generate_exam(
+    topic=None,
+    count=3,
+    filename="generated_exam",
+    specific_ids=None,
+    db=None,
+    progress=None,
+    out_dir=None,
+):
+    """
+    Generates PDF pair (Student + Key).
+    Pass ``db`` to reuse an already loaded DBManager; ``progress`` is
+    passed on to compile_all. Files go to ``out_dir`` (default: the project
+    root), which must lie inside the project root so Typst can resolve
+    "/src/lib.typ"; give each concurrent build its own directory.
+    """
+    if db is None:
+        db = _open_db()
+        if db is None:
+            return None, None
 
     # Select Questions
     selected = []
@@ -137,12 +553,7 @@ def generate_exam(topic=None, count=3, filename="generated_exam", specific_ids=N
             else:
                 print(f"[WARN] ID {qid} not found in DB.")
     else:
-        candidates = list(db.questions.values())
-        if topic:
-            candidates = [
-                q for q in candidates if topic.lower() in (q.topic or "").lower()
-            ]
-
+        candidates = _topic_candidates(db, topic)
         count = min(len(candidates), count)
         if count > 0:
             selected = random.sample(candidates, count)
@@ -151,64 +562,150 @@ def generate_exam(topic=None, count=3, filename="generated_exam", specific_ids=N
         print("[WARN] No questions selected.")
         return None, None
 
-    # Build Body
-    typst_body = ""
-    for i, q in enumerate(selected, 1):
-        typst_body += f'== Question {i}\n#question("{q.id}")\n\n'
+    src_student, src_teacher = _exam_sources(selected, f"Exam: {topic or 'General'}")
 
-    # --- COMPILE 1: STUDENT VERSION (No Solutions) ---
-    # Passing "false" (Typst boolean) to the template
-    src_student = TEMPLATE.format(
-        title=f"Exam: {topic or 'General'}", content=typst_body, show_sol="false"
-    )
-    path_student_typ = PROJECT_ROOT / f"{filename}.typ"
-    path_student_pdf = PROJECT_ROOT / f"{filename}.pdf"
+    out_dir = Path(out_dir) if out_dir else PROJECT_ROOT
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    # --- STUDENT VERSION (No Solutions) ---
+    path_student_typ = out_dir / f"{filename}.typ"
+    path_student_pdf = out_dir / f"{filename}.pdf"
 
     with open(path_student_typ, "w", encoding="utf-8") as f:
         f.write(src_student)
 
-    print("[INFO] Compiling Student Version...")
-    res_std = subprocess.run(
-        [
-            "typst",
-            "compile",
-            "--root",
-            str(PROJECT_ROOT),
-            str(path_student_typ),
-            str(path_student_pdf),
-        ],
-        capture_output=True,
-    )
-    if res_std.returncode != 0:
-        print(f"[ERROR] Student Compile Failed:\n{res_std.stderr.decode()}")
-        return None, None
-
-    # --- COMPILE 2: TEACHER VERSION (With Solutions) ---
-    # Passing "true" to the template
-    src_teacher = TEMPLATE.format(
-        title=f"Exam: {topic or 'General'} (KEY)", content=typst_body, show_sol="true"
-    )
-    path_teacher_typ = PROJECT_ROOT / f"{filename}_key.typ"
-    path_teacher_pdf = PROJECT_ROOT / f"{filename}_key.pdf"
+    # --- TEACHER VERSION (With Solutions) ---
+    path_teacher_typ = out_dir / f"{filename}_key.typ"
+    path_teacher_pdf = out_dir / f"{filename}_key.pdf"
 
     with open(path_teacher_typ, "w", encoding="utf-8") as f:
         f.write(src_teacher)
 
-    print("[INFO] Compiling Teacher Version...")
-    res_key = subprocess.run(
+    # Only the selected questions and what they reference, so compile time
+    # scales with the exam rather than the bank (includes journaled edits)
+    path_bundle = write_bundle(
+        db, [q.id for q in selected], out_dir / f"{filename}.bundle.json"
+    )
+
+    # --- COMPILE BOTH CONCURRENTLY ---
+    print("[INFO] Compiling Student and Teacher Versions...")
+    errors = compile_all(
         [
-            "typst",
-            "compile",
-            "--root",
-            str(PROJECT_ROOT),
-            str(path_teacher_typ),
-            str(path_teacher_pdf),
+            ("Student", path_student_typ, path_student_pdf, path_bundle),
+            ("Key", path_teacher_typ, path_teacher_pdf, path_bundle),
         ],
-        capture_output=True,
+        max_workers=2,
+        progress=progress,
     )
-
-    if res_key.returncode == 0:
-        return path_student_pdf, path_teacher_pdf
-    else:
-        print(f"[ERROR] Key Compile Failed:\n{res_key.stderr.decode()}")
+    if errors:
+        for label, message in errors.items():
+            print(f"[ERROR] {label} Compile Failed:\n{message}")
         return None, None
+
+    return path_student_pdf, path_teacher_pdf
+
+
+# --- 6. BATCH GENERATOR ---
+BATCH_DIR = PROJECT_ROOT / "exam_variants"
+
+
+def _sample_variants(candidates, n, count, rng):
+    """Draws up to ``n`` pairwise distinct question sets of size ``count``."""
+    possible = math.comb(len(candidates), count)
+    if possible < n:
+        print(
+            f"[WARN] Only {possible} distinct question sets exist; "
+            f"generating {possible}."
+        )
+        n = possible
+
+    seen = set()
+    variants = []
+    # Rejection sampling; the attempt cap only matters when n is close to `possible`
+    attempts = 0
+    while len(variants) < n and attempts < n * 20:
+        attempts += 1
+        picked = rng.sample(candidates, count)
+        key = frozenset(q.id for q in picked)
+        if key not in seen:
+            seen.add(key)
+            variants.append(picked)
+    if len(variants) < n:
+        print(f"[WARN] Could only draw {len(variants)} distinct variants.")
+    return variants
+
+
+def generate_batch(
+    n, topic=None, count=3, seed=None, out_dir=None, max_workers=None, db=None
+):
+    """
+    Generates ``n`` randomized exam variants (student + key each) in one run.
+
+    The DB is loaded once, question sets are sampled without duplicates
+    (``seed`` makes the draw reproducible) and all PDFs are compiled in
+    parallel. ``out_dir`` must lie inside the project root so Typst can
+    resolve "/src/lib.typ". Returns the list of (student_pdf, key_pdf)
+    pairs that compiled; a manifest.json maps each variant to its questions.
+    """
+    if db is None:
+        db = _open_db()
+        if db is None:
+            return []
+
+    candidates = _topic_candidates(db, topic)
+    count = min(len(candidates), count)
+    if count == 0:
+        print("[WARN] No questions selected.")
+        return []
+
+    rng = random.Random(seed)
+    variants = _sample_variants(candidates, n, count, rng)
+
+    out_dir = Path(out_dir) if out_dir else BATCH_DIR
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    jobs = []
+    manifest = {}
+    for i, selected in enumerate(variants, 1):
+        name = f"variant_{i:0{len(str(len(variants)))}d}"
+        src_student, src_teacher = _exam_sources(
+            selected, f"Exam: {topic or 'General'} (Variant {i})"
+        )
+        bundle = write_bundle(
+            db, [q.id for q in selected], out_dir / f"{name}.bundle.json"
+        )
+        for suffix, src in (("", src_student), ("_key", src_teacher)):
+            typ_path = out_dir / f"{name}{suffix}.typ"
+            with open(typ_path, "w", encoding="utf-8") as f:
+                f.write(src)
+            jobs.append(
+                (f"{name}{suffix}", typ_path, typ_path.with_suffix(".pdf"), bundle)
+            )
+        manifest[name] = [q.id for q in selected]
+
+    with open(out_dir / "manifest.json", "w", encoding="utf-8") as f:
+        json.dump({"topic": topic, "seed": seed, "variants": manifest}, f, indent=2)
+
+    def report(done, total, label, error):
+        status = "FAILED" if error else "ok"
+        print(f"[INFO] [{done}/{total}] {label} {status}")
+
+    print(f"[INFO] Compiling {len(jobs)} PDFs for {len(variants)} variants...")
+    start = time.perf_counter()
+    errors = compile_all(jobs, max_workers=max_workers, progress=report)
+    elapsed = time.perf_counter() - start
+
+    for label, message in errors.items():
+        print(f"[ERROR] {label} Compile Failed:\n{message}")
+
+    results = []
+    for name in manifest:
+        if name not in errors and f"{name}_key" not in errors:
+            results.append((out_dir / f"{name}.pdf", out_dir / f"{name}_key.pdf"))
+
+    rate = len(results) / elapsed if elapsed > 0 else float("inf")
+    print(
+        f"[INFO] Built {len(results)}/{len(variants)} variants in {elapsed:.2f}s "
+        f"({rate:.2f} variants/sec)"
+    )
+    return results
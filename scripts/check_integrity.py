@@ -1,6 +1,5 @@
 import sys
 from pathlib import Path
-from typing import List, Set
 
 # --- SETUP PATHS ---
 # Ensure we can import from the scripts module
@@ -8,87 +7,41 @@ PROJECT_ROOT = Path(__file__).resolve().parent.parent
 sys.path.append(str(PROJECT_ROOT))
 
 try:
-    from scripts.db_manager import DBManager
+    from scripts.validate import INTEGRITY_CHECKS, exit_code, validate
 except ImportError as e:
     print(f"❌ Import Error: {e}")
-    sys.exit(1)
+    sys.exit(2)
 
 
-def check_integrity() -> None:
+def check_integrity(data_dir: Path = PROJECT_ROOT / "data") -> int:
+    """Prints every duplicate id and broken link, and returns the exit code."""
     print("========================================")
     print("   🛡️  DATA INTEGRITY & TYPE CHECK   ")
     print("========================================")
 
-    data_dir = PROJECT_ROOT / "data"
     if not data_dir.exists():
         print(f"❌ Data directory not found at: {data_dir}")
-        return
+        return 2
 
-    # 1. Load Database
-    print("[1/3] Loading Database...")
-    try:
-        db = DBManager(data_dir)
-    except Exception as e:
-        print(f"❌ DB Load Failed: {e}")
-        return
+    # 1. Load and index every file once (in parallel on large banks)
+    print("[1/2] Loading Database...")
+    report = validate(data_dir)
+    print(f"   -> Found {report['items']} items in {report['files']} files.")
 
-    # 2. Collect All IDs for Lookup
-    print("[2/3] Indexing IDs...")
-    all_ids: Set[str] = set()
-    all_ids.update(db.questions.keys())
-    all_ids.update(db.definitions.keys())
-    all_ids.update(db.tools.keys())
-    all_ids.update(db.mistakes.keys())
-    all_ids.update(db.examples.keys())
-    all_ids.update(db.lectures.keys())
-    all_ids.update(db.tutorials.keys())
-    # Note: Courses might not be in DBManager if not added explicitly,
-    # but if they are, add them. Assuming DBManager has them or we skip.
-
-    print(f"   -> Found {len(all_ids)} unique items.")
-
-    # 3. Verify Links (Foreign Keys)
-    print("[3/3] Verifying Relationships...")
+    # 2. Verify Links (Foreign Keys)
+    print("[2/2] Verifying Relationships...")
     error_count = 0
-
-    def check_ref(source_id: str, ref_id: str, field_name: str) -> None:
-        nonlocal error_count
-        if ref_id and ref_id not in all_ids:
+    for issue in report["issues"]:
+        if issue["check"] not in INTEGRITY_CHECKS:
+            continue
+        error_count += 1
+        if issue["check"] == "duplicate-id":
             print(
-                f"   🚩 Broken Link in [{source_id}]: '{field_name}' points to unknown ID '{ref_id}'"
+                f"   🚩 Duplicate ID [{issue['id']}] in {issue['file']}: "
+                f"{issue['message']}"
             )
-            error_count += 1
-
-    def check_refs(source_id: str, ref_ids: List[str], field_name: str) -> None:
-        for rid in ref_ids:
-            check_ref(source_id, rid, field_name)
-
-    # --- CHECK QUESTIONS ---
-    for q in db.questions.values():
-        check_refs(q.id, q.tools, "tools")
-        # Mistake IDs in questions are stored as strings in 'common_mistakes'
-        check_refs(q.id, q.common_mistakes, "common_mistakes")
-
-    # --- CHECK EXAMPLES ---
-    for ex in db.examples.values():
-        check_refs(ex.id, ex.related_definition_ids, "related_definition_ids")
-
-    # --- CHECK LECTURES ---
-    for lec in db.lectures.values():
-        if lec.course_id:
-            # We assume course IDs are not in the main 'all_ids' unless loaded
-            # If you load courses in DBManager, uncomment the check below:
-            # check_ref(lec.id, lec.course_id, "course_id")
-            pass
-        check_refs(lec.id, lec.definition_ids, "definition_ids")
-        check_refs(lec.id, lec.tool_ids, "tool_ids")
-        check_refs(lec.id, lec.example_ids, "example_ids")
-
-    # --- CHECK TUTORIALS ---
-    for tut in db.tutorials.values():
-        if tut.lecture_ref:
-            check_ref(tut.id, tut.lecture_ref, "lecture_ref")
-        check_refs(tut.id, tut.example_question_ids, "example_question_ids")
+        else:
+            print(f"   🚩 Broken Link in [{issue['id']}]: {issue['message']}")
 
     # --- SUMMARY ---
     print("-" * 40)
@@ -97,7 +50,8 @@ def check_integrity() -> None:
     else:
         print(f"❌ FOUND {error_count} BROKEN LINKS.")
         print("   Action: Open the YAML files mentioned above and fix the IDs.")
+    return exit_code(report, INTEGRITY_CHECKS)
 
 
 if __name__ == "__main__":
-    check_integrity()
+    sys.exit(check_integrity())
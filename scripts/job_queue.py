@@ -0,0 +1,156 @@
+"""
+Background jobs (exam compiles, previews) for the Streamlit app.
+
+A script run submits a job and gets its id back immediately; the UI then
+polls status() until the job has finished. Identical jobs that are still
+queued or running are merged, so ten users pressing "Compile" on the same
+exam start one compile.
+
+Jobs that write files get their own workspace directory (``workspace=True``),
+so concurrent builds never overwrite each other's output. Workspaces are
+deleted after JOB_TTL_S, and only the newest MAX_WORKSPACES are kept.
+"""
+
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+# Jobs mostly wait on typst subprocesses, which build_exam caps separately,
+# so threads are enough; a few extra keep previews from queueing behind compiles
+MAX_JOB_WORKERS = 2 * (os.cpu_count() or 2)
+# Finished jobs are kept this long for their sessions to collect the result
+JOB_TTL_S = 60 * 60
+MAX_WORKSPACES = 100
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    key: Any
+    status: str = QUEUED
+    progress: float = 0.0
+    message: str = ""
+    result: Any = None
+    error: Optional[str] = None
+    workspace: Optional[Path] = None
+    created: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED)
+
+    def report(self, done, total, label=None, error=None):
+        """Progress callback in the compile_all(progress=...) format."""
+        self.progress = done / total if total else 1.0
+        self.message = f"{label or ''} {'failed' if error else 'done'}".strip()
+
+
+class JobQueue:
+    """Runs jobs on a bounded thread pool; safe to share between sessions."""
+
+    def __init__(self, max_workers: int = None, workspace_root: Path = None):
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers or MAX_JOB_WORKERS, thread_name_prefix="job"
+        )
+        self.workspace_root = Path(workspace_root) if workspace_root else None
+        self._lock = threading.Lock()
+        # Serializes pruning with creating workspaces, so no new one is pruned
+        self._workspace_lock = threading.Lock()
+        self._jobs = {}
+        self._in_flight = {}  # key -> id of the queued/running job
+
+    def submit(
+        self, kind: str, fn: Callable, *args, key=None, workspace=False, **kwargs
+    ) -> str:
+        """
+        Queues ``fn(*args, progress=job.report, **kwargs)`` and returns the
+        job id. If a job with the same ``key`` is still queued or running,
+        its id is returned instead and nothing new is queued. With
+        ``workspace``, ``fn`` also gets ``workspace=<empty job directory>``.
+        """
+        if workspace and self.workspace_root is None:
+            raise ValueError("This JobQueue has no workspace_root.")
+        with self._lock:
+            self._prune()
+            if key is not None and key in self._in_flight:
+                return self._in_flight[key]
+            # Unique across restarts, so old workspaces are never reused
+            job = Job(id=f"{kind}-{uuid.uuid4().hex[:12]}", kind=kind, key=key)
+            self._jobs[job.id] = job
+            if key is not None:
+                self._in_flight[key] = job.id
+
+        if workspace:
+            with self._workspace_lock:
+                self._prune_workspaces(keep=self._unfinished_ids())
+                job.workspace = self.workspace_root / job.id
+                job.workspace.mkdir(parents=True)
+            kwargs["workspace"] = job.workspace
+        self._pool.submit(self._run, job, fn, args, kwargs)
+        return job.id
+
+    def _run(self, job, fn, args, kwargs):
+        job.status = RUNNING
+        try:
+            result, error = fn(*args, progress=job.report, **kwargs), None
+        except Exception as e:
+            result, error = None, f"{type(e).__name__}: {e}"
+            print(f"[ERROR] Job {job.id} failed: {error}")
+        with self._lock:
+            # Together under the lock: a finished job always has finished_at
+            job.result, job.error = result, error
+            job.finished_at = time.time()
+            if error is None:
+                job.progress = 1.0
+            job.status = DONE if error is None else FAILED
+            if self._in_flight.get(job.key) == job.id:
+                del self._in_flight[job.key]
+
+    def status(self, job_id: str) -> Optional[Job]:
+        """A snapshot of the job (None if unknown or expired)."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return replace(job) if job is not None else None
+
+    def _unfinished_ids(self):
+        """Ids of every queued or running job, keyed or not."""
+        with self._lock:
+            return {job.id for job in self._jobs.values() if not job.finished}
+
+    def _prune(self):
+        cutoff = time.time() - JOB_TTL_S
+        for job_id, job in list(self._jobs.items()):
+            if job.finished and job.finished_at < cutoff:
+                del self._jobs[job_id]
+
+    def _prune_workspaces(self, keep):
+        """Deletes expired workspaces, then the oldest beyond MAX_WORKSPACES."""
+        try:
+            entries = [
+                (entry.stat().st_mtime, Path(entry.path))
+                for entry in os.scandir(self.workspace_root)
+                if entry.is_dir() and entry.name not in keep
+            ]
+        except FileNotFoundError:
+            return
+        entries.sort(reverse=True)  # Newest first
+        cutoff = time.time() - JOB_TTL_S
+        for i, (mtime, path) in enumerate(entries):
+            if mtime < cutoff or i >= MAX_WORKSPACES - len(keep):
+                shutil.rmtree(path, ignore_errors=True)
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
@@ -0,0 +1,136 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def _lock_file(f):
+    """Blocks until this process holds an exclusive lock on open file ``f``."""
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        return
+    f.seek(0)
+    while True:
+        try:
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            continue  # LK_LOCK gives up after ~10 s; keep waiting
+
+
+def _unlock_file(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class Journal:
+    """
+    Append-only log of DBManager mutations (one JSON object per line).
+
+    Every entry is fsynced before append() returns, so an edit that was
+    reported as successful survives a crash. A torn last line (crash while
+    writing) is ignored on replay.
+
+    Appends and clears are serialized across processes by a lock file next
+    to the journal; see lock().
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.lock_path = path.with_name(path.name + ".lock")
+        self._count = None
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+
+    @contextmanager
+    def lock(self):
+        """
+        Holds the journal lock, shared by every process using this data
+        directory. Hold it around read-modify-write sequences such as
+        compaction, so no append lands between reading the journal and
+        clearing it. Reentrant within one Journal object.
+        """
+        with self._thread_lock:
+            if self._depth:
+                self._depth += 1
+                try:
+                    yield
+                finally:
+                    self._depth -= 1
+                return
+            with open(self.lock_path, "a+b") as f:
+                _lock_file(f)
+                self._depth = 1
+                try:
+                    yield
+                finally:
+                    self._depth = 0
+                    _unlock_file(f)
+
+    def append(self, entry: dict):
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self.lock():
+            count = len(self)
+            if self._has_torn_tail():
+                # Keep a crashed partial line from swallowing this one
+                line = "\n" + line
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self._count = count + 1
+
+    def _has_torn_tail(self):
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                return f.read(1) != b"\n"
+        except OSError:
+            return False  # Missing or empty file
+
+    def entries(self):
+        """Yields the valid entries in write order."""
+        if not self.path.exists():
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    name = self.path.name
+                    print(f"[WARN] Ignoring corrupt journal line {line_no} in {name}")
+
+    def clear(self):
+        """
+        Drops all entries once they have been compacted into the YAML files.
+        Callers must re-read the journal under the same lock() first, or
+        entries appended since they last read it are lost.
+        """
+        with self.lock():
+            if self.path.exists():
+                self.path.unlink()
+            self._count = 0
+
+    def is_empty(self):
+        """Whether the file holds no entries; checked on disk, not cached."""
+        try:
+            return self.path.stat().st_size == 0
+        except FileNotFoundError:
+            return True
+
+    def __len__(self):
+        if self._count is None:
+            self._count = sum(1 for _ in self.entries())
+        return self._count
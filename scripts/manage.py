@@ -1,16 +1,25 @@
 import argparse
 import sys
 from pathlib import Path
-from dataclasses import fields, is_dataclass, MISSING
+from dataclasses import fields, MISSING
 from enum import Enum
-import yaml
 
 # Add project root to sys.path to allow importing from 'scripts'
 project_root = Path(__file__).resolve().parent.parent
 sys.path.append(str(project_root))
 
-from scripts.db_manager import DBManager  # noqa: E402
+from scripts.db_manager import (  # noqa: E402,F401
+    DBManager,
+    LAYOUTS,
+    TYPE_TO_FILENAME_MAP,
+    TYPE_TO_STORAGE_MAP,
+)
 
+from scripts.sqlite_backend import (  # noqa: E402
+    SQLiteDBManager,
+    export_yaml,
+    import_yaml,
+)
 from scripts.models import (  # noqa: E402
     Definition,
     Tool,
@@ -38,43 +47,6 @@ NODE_TYPE_MAP = {
 }
 
 
-TYPE_TO_FILENAME_MAP = {
-    Definition: "definitions.yaml",
-    Tool: "tools.yaml",
-    Example: "examples.yaml",
-    Mistake: "mistakes.yaml",
-    Course: "courses.yaml",
-    Lecture: "lectures.yaml",
-    Tutorial: "tutorials.yaml",
-    Question: "questions.yaml",
-    Homework: "homework.yaml",
-}
-
-
-# --- 2. YAML FORMATTER (THE FIX) ---
-
-
-def str_presenter(dumper, data):
-    """
-
-    Configures YAML to use the Block Style (|) for strings containing
-
-    math symbols like $, \\, {, }, or newlines.
-
-    This prevents PyYAML from escaping characters (e.g. changing '\' to '\\').
-
-    """
-
-    if len(data.splitlines()) > 1 or any(c in data for c in "$[]{}\\"):
-
-        return dumper.represent_scalar("tag:yaml.org,2002:str", data, style="|")
-
-    return dumper.represent_scalar("tag:yaml.org,2002:str", data)
-
-
-yaml.add_representer(str, str_presenter)
-
-
 # --- 3. CORE LOGIC ---
 
 
@@ -104,74 +76,9 @@ def get_multiline_input(prompt):
 
 
 def save_changes(db_manager: DBManager):
-    """Saves all in-memory data back to YAML with the new formatter."""
-
-    nodes_by_type = {}
-
-    for node in db_manager.nodes.values():
-
-        node_type = type(node)
-
-        if node_type not in nodes_by_type:
-
-            nodes_by_type[node_type] = []
-
-        nodes_by_type[node_type].append(node)
-
-    for node_type, filename in TYPE_TO_FILENAME_MAP.items():
-
-        file_path = db_manager.data_path / filename
-
-        nodes_to_save = nodes_by_type.get(node_type, [])
-
-        if not nodes_to_save:
-
-            if file_path.exists():
-
-                file_path.unlink()
-
-            continue
-
-        list_of_dicts = []
-
-        for node in sorted(nodes_to_save, key=lambda n: n.id):
-
-            node_dict = {}
+    """Flushes pending edits into the YAML files and clears the journal."""
 
-            for f in fields(node):
-
-                value = getattr(node, f.name)
-
-                if value is None or (isinstance(value, list) and not value):
-
-                    continue
-
-                if isinstance(value, Enum):
-
-                    node_dict[f.name] = value.value
-
-                elif isinstance(value, list) and value and is_dataclass(value[0]):
-
-                    node_dict[f.name] = [item.__dict__ for item in value]
-
-                else:
-
-                    node_dict[f.name] = value
-
-            list_of_dicts.append(node_dict)
-
-        with open(file_path, "w", encoding="utf-8") as f:
-
-            # allow_unicode=True is CRITICAL for math symbols
-
-            yaml.dump(
-                list_of_dicts,
-                f,
-                sort_keys=False,
-                indent=2,
-                default_flow_style=False,
-                allow_unicode=True,
-            )
+    db_manager.compact()
 
 
 def handle_add(args, db: DBManager):
@@ -224,7 +131,7 @@ def handle_add(args, db: DBManager):
                 else []
             )
 
-        elif issubclass(f.type, Enum):
+        elif isinstance(f.type, type) and issubclass(f.type, Enum):
 
             enum_choices = [e.value for e in f.type]
 
@@ -262,7 +169,7 @@ def handle_add(args, db: DBManager):
 
         db.add_node(new_node)
 
-        save_changes(db)  # This now uses the smart dumper
+        db.maybe_compact()  # Journaled; the YAML is only rewritten periodically
 
         print(f"\n[Success] Added {node_type_str} '{new_node.id}'.")
 
@@ -281,24 +188,91 @@ def handle_list(args, db: DBManager):
 
         return
 
-    for node in sorted(db.nodes.values(), key=lambda x: x.id):
-
-        if isinstance(node, node_class):
+    # Only the requested type's file is loaded
+    storage = getattr(db, TYPE_TO_STORAGE_MAP[node_class])
+    for node_id in sorted(storage):
 
-            print(f"- {node.id}")
+        print(f"- {node_id}")
 
 
 def handle_delete(args, db: DBManager):
     try:
         db.delete_node(args.id)
-        save_changes(db)
+        db.maybe_compact()
         print(f"[Success] Deleted node '{args.id}'.")
     except ValueError as e:
         print(f"[Error] {e}")
 
 
+def handle_refs(args, db: DBManager):
+    if args.id not in db.nodes:
+        print(f"[Error] Node with id '{args.id}' not found.")
+        return
+    refs = db.referrers(args.id)
+    if not refs:
+        print(f"No nodes reference '{args.id}'.")
+        return
+    print(f"--- Nodes referencing '{args.id}' ---")
+    for source_id, field_name in refs:
+        print(f"{source_id} ({field_name})")
+
+
+def handle_migrate(args, db: DBManager):
+    converted = db.migrate(args.layout)
+    if converted:
+        names = ", ".join(TYPE_TO_STORAGE_MAP[t] for t in converted)
+        print(f"[Success] Migrated {names} to the {args.layout} layout.")
+    else:
+        print(f"[Success] Data already uses the {args.layout} layout.")
+
+
+def handle_import_yaml(args, db: DBManager):
+    if not args.sqlite:
+        print("[Error] import-yaml needs --sqlite FILE.")
+        return
+    count = import_yaml(project_root / "data", args.sqlite)
+    print(f"[Success] Imported {count} nodes into '{args.sqlite}'.")
+
+
+def handle_export_yaml(args, db: DBManager):
+    if not args.sqlite:
+        print("[Error] export-yaml needs --sqlite FILE.")
+        return
+    count = export_yaml(args.sqlite, project_root / "data")
+    print(f"[Success] Exported {count} nodes to data/.")
+
+
+def handle_compact(args, db: DBManager):
+    pending = len(db.journal) if db.journal is not None else 0
+    save_changes(db)
+    print(f"[Success] Compacted {pending} journal entries into the YAML files.")
+
+
+def handle_batch(args, db: DBManager):
+    # Imported lazily: build_exam is only needed for this command
+    from scripts.build_exam import generate_batch
+
+    results = generate_batch(
+        args.n,
+        topic=args.topic,
+        count=args.count,
+        seed=args.seed,
+        out_dir=args.out,
+        max_workers=args.workers,
+        db=db,
+    )
+    if results:
+        out_dir = results[0][0].parent
+        print(f"[Success] Wrote {len(results)} exam variants to '{out_dir}'.")
+    else:
+        print("[Error] No exam variants were built.")
+
+
 def main():
     parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--sqlite", metavar="FILE", help="Use a SQLite bank instead of data/*.yaml"
+    )
     subparsers = parser.add_subparsers(dest="command", required=True)
 
     p_add = subparsers.add_parser("add")
@@ -313,10 +287,42 @@ def main():
     p_del.add_argument("id")
     p_del.set_defaults(func=handle_delete)
 
+    p_refs = subparsers.add_parser("refs", help="List the nodes that reference an id")
+    p_refs.add_argument("id")
+    p_refs.set_defaults(func=handle_refs)
+
+    p_compact = subparsers.add_parser("compact")
+    p_compact.set_defaults(func=handle_compact)
+
+    p_migrate = subparsers.add_parser(
+        "migrate", help="Convert data/ between one file per type and one per node"
+    )
+    p_migrate.add_argument("layout", choices=LAYOUTS)
+    p_migrate.set_defaults(func=handle_migrate)
+
+    p_import = subparsers.add_parser(
+        "import-yaml", help="Replace the --sqlite bank with the contents of data/"
+    )
+    p_import.set_defaults(func=handle_import_yaml)
+
+    p_export = subparsers.add_parser(
+        "export-yaml", help="Write the --sqlite bank to data/*.yaml for Typst"
+    )
+    p_export.set_defaults(func=handle_export_yaml)
+
+    p_batch = subparsers.add_parser("batch", help="Build N randomized exam variants")
+    p_batch.add_argument("n", type=int)
+    p_batch.add_argument("--topic")
+    p_batch.add_argument("--count", type=int, default=3)
+    p_batch.add_argument("--seed", type=int)
+    p_batch.add_argument("--out", help="Output directory inside the project root")
+    p_batch.add_argument("--workers", type=int)
+    p_batch.set_defaults(func=handle_batch)
+
     args = parser.parse_args()
     data_path = project_root / "data"
     try:
-        db = DBManager(data_path)
+        db = SQLiteDBManager(args.sqlite) if args.sqlite else DBManager(data_path)
         args.func(args, db)
     except Exception as e:
         print(f"Error: {e}")
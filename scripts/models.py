@@ -1,9 +1,20 @@
+import sys
 from dataclasses import dataclass, field
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, cast
 from enum import Enum
 
 
 # --- 1. ENUMS & TYPES ---
+def _fold_lookup(enum_class, value):
+    """Case-insensitive member lookup, for use in Enum._missing_."""
+    if isinstance(value, str):
+        folded = value.casefold()
+        for member in enum_class:
+            if member.value.casefold() == folded:
+                return member
+    return None
+
+
 class ExampleType(str, Enum):
     CALCULATION = "calculation"
     PROOF = "proof"
@@ -12,6 +23,13 @@ class ExampleType(str, Enum):
     STANDARD = "Standard"
     COUNTER_EXAMPLE = "Counter-Example"  # Added to match YAML
 
+    @classmethod
+    def _missing_(cls, value):
+        return _fold_lookup(cls, value)
+
+    def __str__(self):
+        return self.value  # Messages show "proof", not "ExampleType.PROOF"
+
 
 class RelationshipType(str, Enum):
     RELIES_ON = "relies_on"
@@ -23,37 +41,65 @@ class Severity(str, Enum):
     MINOR = "minor"
     MODERATE = "moderate"
     CRITICAL = "critical"
-    # Fallback for case sensitivity
-    Critical = "Critical"
-    Minor = "Minor"
-    Moderate = "Moderate"
+
+    @classmethod
+    def _missing_(cls, value):
+        # YAML has both "Critical" and "critical"
+        return _fold_lookup(cls, value)
+
+    def __str__(self):
+        return self.value  # Messages show "critical", not "Severity.CRITICAL"
+
+
+# Values repeated across the whole bank (topics, lecturers, step types) are
+# interned and enum-like fields are mapped onto their Enum member, so every
+# node shares one object per distinct value and comparisons are cheap.
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+def _normalize(enum_class, value):
+    """The matching enum member, or the interned value if there is none."""
+    if value is None or isinstance(value, enum_class):
+        return value
+    try:
+        return enum_class(value)
+    except ValueError:
+        return _intern(value)  # Keep unknown values loadable
 
 
 # --- 2. CORE GRAPH PRIMITIVES ---
-@dataclass
+# All models use slots=True: no per-instance __dict__, which matters with
+# hundreds of thousands of nodes and answer steps in memory. Do not set
+# attributes on nodes that are not declared fields.
+@dataclass(slots=True)
 class KnowledgeNode:
     """Base class for all nodes. Ensures every object has an ID."""
 
     id: str
 
 
-@dataclass
+@dataclass(slots=True)
 class Relationship:
     source: str
     target: str
     type: str
 
 
-@dataclass
+@dataclass(slots=True)
 class AnswerStep:
     type: str
     title: str
     content: str
     proof: Optional[str] = None  # Added to match YAML (some steps have 'proof: null')
 
+    def __post_init__(self):
+        self.type = _intern(self.type)
+        self.title = _intern(self.title)
+
 
 # --- 3. UNIVERSITY STRUCTURES ---
-@dataclass
+@dataclass(slots=True)
 class Course(KnowledgeNode):
     name: str
     # Added fields found in audit
@@ -62,7 +108,7 @@ class Course(KnowledgeNode):
     example_sequence: List[str] = field(default_factory=list)
 
 
-@dataclass
+@dataclass(slots=True)
 class Lecture(KnowledgeNode):
     # 'name' replaced by 'title' to match YAML
     title: str
@@ -75,7 +121,7 @@ class Lecture(KnowledgeNode):
     example_ids: List[str] = field(default_factory=list)
 
 
-@dataclass
+@dataclass(slots=True)
 class Tutorial(KnowledgeNode):
     # Made optional because YAML doesn't always have them
     title: Optional[str] = None
@@ -93,7 +139,7 @@ class Tutorial(KnowledgeNode):
             )
 
 
-@dataclass
+@dataclass(slots=True)
 class Homework(KnowledgeNode):
     title: str
     week: int
@@ -101,7 +147,7 @@ class Homework(KnowledgeNode):
 
 
 # --- 4. EXAM CONTENT MODELS ---
-@dataclass
+@dataclass(slots=True)
 class Question(KnowledgeNode):
     year: int
     lecturer: str
@@ -116,15 +162,16 @@ class Question(KnowledgeNode):
     common_mistakes: List[str] = field(default_factory=list)
 
     def __post_init__(self):
-            # Handle nested AnswerStep objects if they come in as dicts from YAML
-            if self.answer_steps and isinstance(self.answer_steps[0], dict):
-                # FIX: Explicitly cast to list of dicts to satisfy Pylance/MyPy
-                from typing import cast, Dict, Any
-                steps_data = cast(List[Dict[str, Any]], self.answer_steps)
-                self.answer_steps = [AnswerStep(**step) for step in steps_data]
+        self.topic = _intern(self.topic)
+        self.lecturer = _intern(self.lecturer)
+        # Handle nested AnswerStep objects if they come in as dicts from YAML
+        if self.answer_steps and isinstance(self.answer_steps[0], dict):
+            # FIX: Explicitly cast to list of dicts to satisfy Pylance/MyPy
+            steps_data = cast(List[Dict[str, Any]], self.answer_steps)
+            self.answer_steps = [AnswerStep(**step) for step in steps_data]
 
 
-@dataclass
+@dataclass(slots=True)
 class Definition(KnowledgeNode):
     content: str
     term: Optional[str] = None
@@ -137,7 +184,7 @@ class Definition(KnowledgeNode):
             self.term = "Untitled Definition"
 
 
-@dataclass
+@dataclass(slots=True)
 class Tool(KnowledgeNode):
     description: Optional[str] = None
     usage: Optional[str] = None
@@ -156,7 +203,7 @@ class Tool(KnowledgeNode):
             self.description = "No description provided."
 
 
-@dataclass
+@dataclass(slots=True)
 class Mistake(KnowledgeNode):
     description: str
     severity: Optional[str] = (
@@ -168,12 +215,13 @@ class Mistake(KnowledgeNode):
     remedy: Optional[str] = None
 
     def __post_init__(self):
+        self.severity = _normalize(Severity, self.severity)
         # Normalize remedy/correction
         if not self.correction and self.remedy:
             self.correction = self.remedy
 
 
-@dataclass
+@dataclass(slots=True)
 class Example(KnowledgeNode):
     name: str  # Renamed from 'title' to match YAML
     content: str
@@ -182,3 +230,6 @@ class Example(KnowledgeNode):
     )
     # Added fields found in audit
     related_definition_ids: List[str] = field(default_factory=list)
+
+    def __post_init__(self):
+        self.type = _normalize(ExampleType, self.type)
@@ -0,0 +1,112 @@
+import re
+from bisect import bisect_left
+from collections import defaultdict
+from dataclasses import fields, is_dataclass
+
+TOKEN = re.compile(r"\w+")
+
+# Matches in these fields count more than matches in body text
+FIELD_WEIGHTS = {
+    "id": 3.0,
+    "term": 3.0,
+    "name": 3.0,
+    "short_name": 3.0,
+    "title": 3.0,
+    "topic": 2.0,
+}
+# A query token that is a whole word scores higher than one that is a prefix
+PREFIX_PENALTY = 0.5
+
+
+def tokenize(text):
+    return TOKEN.findall(text.lower())
+
+
+def _node_text(node):
+    """Yields (field name, text) for every string field of ``node``, including
+    the strings nested in dataclass lists such as a question's answer steps."""
+    for f in fields(node):
+        value = getattr(node, f.name)
+        if isinstance(value, str):
+            yield f.name, value
+        elif isinstance(value, list):
+            for item in value:
+                if isinstance(item, str):
+                    yield f.name, item
+                elif is_dataclass(item):
+                    for sub in fields(item):
+                        sub_value = getattr(item, sub.name)
+                        if isinstance(sub_value, str):
+                            yield f.name, sub_value
+
+
+class SearchIndex:
+    """
+    Inverted index over the text of knowledge nodes.
+
+    Each token maps to {node id: weighted term frequency}. Queries are ANDed
+    across tokens, and every query token also matches the indexed words it is
+    a prefix of, so results update sensibly while the user is still typing.
+    """
+
+    def __init__(self):
+        self.postings = defaultdict(dict)  # token -> {node id: score}
+        self.node_tokens = {}  # node id -> tokens, for removal
+        self._vocab = None  # sorted tokens for prefix lookup, rebuilt lazily
+
+    def add(self, node):
+        if node.id in self.node_tokens:
+            self.remove(node.id)
+        scores = defaultdict(float)
+        for field_name, text in _node_text(node):
+            weight = FIELD_WEIGHTS.get(field_name, 1.0)
+            for token in tokenize(text):
+                scores[token] += weight
+        for token, score in scores.items():
+            if token not in self.postings:
+                self._vocab = None
+            self.postings[token][node.id] = score
+        self.node_tokens[node.id] = tuple(scores)
+
+    def remove(self, node_id):
+        for token in self.node_tokens.pop(node_id, ()):
+            posting = self.postings.get(token)
+            if posting is None:
+                continue
+            posting.pop(node_id, None)
+            if not posting:
+                del self.postings[token]
+                self._vocab = None
+
+    def _expand(self, prefix):
+        """Yields the indexed tokens that start with ``prefix``."""
+        if self._vocab is None:
+            self._vocab = sorted(self.postings)
+        i = bisect_left(self._vocab, prefix)
+        while i < len(self._vocab) and self._vocab[i].startswith(prefix):
+            yield self._vocab[i]
+            i += 1
+
+    def search(self, query):
+        """Returns [(node id, score)] for nodes matching every query token,
+        best first (ties broken by id)."""
+        totals = None
+        for q_token in set(tokenize(query)):
+            scores = defaultdict(float)
+            for token in self._expand(q_token):
+                factor = 1.0 if token == q_token else PREFIX_PENALTY
+                for node_id, score in self.postings[token].items():
+                    scores[node_id] += score * factor
+            if totals is None:
+                totals = scores
+            else:
+                totals = {
+                    node_id: total + scores[node_id]
+                    for node_id, total in totals.items()
+                    if node_id in scores
+                }
+            if not totals:
+                return []
+        if totals is None:
+            return []
+        return sorted(totals.items(), key=lambda hit: (-hit[1], hit[0]))
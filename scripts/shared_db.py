@@ -0,0 +1,246 @@
+"""
+One in-memory DBManager shared by every session of a long-running process
+(the Streamlit app), kept in sync with edits made to data/ on disk.
+
+Readers and the reloader are coordinated by a reader/writer lock. When a
+YAML file changes, only that node type is re-parsed and compared with the
+loaded nodes (outside the write lock); readers are blocked just while the
+nodes that actually changed are swapped in. Journal appends reload only the
+node types of the new entries.
+"""
+
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from scripts.db_manager import (
+    JOURNAL_FILE,
+    TYPE_TO_FILENAME_MAP,
+    TYPE_TO_STORAGE_MAP,
+    DBManager,
+)
+from scripts.journal import Journal
+
+try:
+    from watchdog.observers import Observer
+except ImportError:  # Optional: without it, use reload() ("Refresh Database")
+    Observer = None
+
+# Editors and compact() touch a file several times per save
+RELOAD_DELAY_S = 0.5
+
+_FILENAME_TO_TYPE = {name: t for t, name in TYPE_TO_FILENAME_MAP.items()}
+_SHARD_DIR_TO_TYPE = {Path(name).stem: t for t, name in TYPE_TO_FILENAME_MAP.items()}
+_NAME_TO_TYPE = {t.__name__: t for t in TYPE_TO_FILENAME_MAP}
+
+
+class RWLock:
+    """
+    Many readers or one writer. A waiting writer goes first, so a steady
+    stream of readers cannot starve a reload. Not reentrant.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._waiting_writers += 1
+            try:
+                while self._writer or self._readers:
+                    self._cond.wait()
+            finally:
+                self._waiting_writers -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+class _DataEventHandler:
+    """watchdog handler forwarding file events to SharedDB.notify()."""
+
+    def __init__(self, shared):
+        self.shared = shared
+
+    def dispatch(self, event):
+        if event.is_directory or event.event_type in ("opened", "closed_no_write"):
+            return
+        self.shared.notify(event.src_path)
+        dest = getattr(event, "dest_path", None)
+        if dest:  # Atomic saves rename a temp file onto the real one
+            self.shared.notify(dest)
+
+
+class SharedDB:
+    """
+    A fully loaded DBManager (with its search index) plus the lock guarding it.
+
+    Access the bank through ``with shared.read() as db:``; keep the block
+    short and do not nest it. Nodes taken out of the block stay valid: a
+    reload swaps in new node objects instead of mutating the old ones.
+    """
+
+    def __init__(self, data_path: Path, watch: bool = True):
+        self.data_path = Path(data_path)
+        self.lock = RWLock()
+        self._pending = set()
+        self._pending_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+
+        # (inode, entry count) of the journal as last seen; taken before the
+        # load, so an entry appended meanwhile is reloaded rather than missed
+        self._journal = Journal(self.data_path / JOURNAL_FILE)
+        self._journal_seen = (None, 0)
+        self._journal_changed = False
+        self._new_journal_types()
+
+        self.db = DBManager(self.data_path)
+        self.db.load_all()
+        self.db.build_search_index()
+        self._timer = None
+        self._observer = None
+        if watch:
+            self.start_watching()
+
+    @contextmanager
+    def read(self):
+        with self.lock.read():
+            yield self.db
+
+    @contextmanager
+    def write(self):
+        with self._reload_lock, self.lock.write():
+            yield self.db
+
+    # --- FILE WATCHING ---
+    def start_watching(self):
+        if Observer is None:
+            print("[WARN] watchdog is not installed: data/ edits need a refresh.")
+            return
+        self._observer = Observer()
+        self._observer.daemon = True
+        self._observer.schedule(
+            _DataEventHandler(self), str(self.data_path), recursive=True
+        )
+        self._observer.start()
+
+    def stop(self):
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer = None
+        with self._pending_lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def node_types_for(self, path):
+        """The node types a change to ``path`` affects (empty if none)."""
+        try:
+            parts = Path(path).resolve().relative_to(self.data_path.resolve()).parts
+        except ValueError:
+            return set()
+        if len(parts) == 1 and parts[0] in _FILENAME_TO_TYPE:
+            return {_FILENAME_TO_TYPE[parts[0]]}
+        if (
+            len(parts) == 2
+            and parts[0] in _SHARD_DIR_TO_TYPE
+            and parts[1].endswith(".yaml")
+            and not parts[1].startswith(".")
+        ):
+            return {_SHARD_DIR_TO_TYPE[parts[0]]}
+        return set()  # Snapshots in .cache/ (written by loads), temp files, ...
+
+    def _is_journal(self, path):
+        return Path(path).resolve() == self._journal.path.resolve()
+
+    def _new_journal_types(self):
+        """Node types of the entries journaled since the last call."""
+        try:
+            inode = self._journal.path.stat().st_ino
+        except FileNotFoundError:
+            inode = None
+        entries = list(self._journal.entries())
+        seen_inode, seen = self._journal_seen
+        if inode != seen_inode or len(entries) < seen:
+            seen = 0  # Compacted (the YAML events cover that) and started afresh
+        self._journal_seen = (inode, len(entries))
+
+        node_types = set()
+        for entry in entries[seen:]:
+            node_type = _NAME_TO_TYPE.get(entry.get("type"))
+            if node_type is None:
+                return set(TYPE_TO_FILENAME_MAP)  # Untyped entries apply to all
+            node_types.add(node_type)
+        return node_types
+
+    def notify(self, path):
+        """Schedules a reload of whatever ``path`` holds, once edits settle."""
+        journal = self._is_journal(path)
+        node_types = set() if journal else self.node_types_for(path)
+        if not (journal or node_types):
+            return
+        with self._pending_lock:
+            self._pending |= node_types
+            self._journal_changed |= journal
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(RELOAD_DELAY_S, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        """Reloads the node types changed since the last reload, now."""
+        with self._pending_lock:
+            node_types, self._pending = self._pending, set()
+            journal, self._journal_changed = self._journal_changed, False
+            self._timer = None
+            if journal:
+                node_types |= self._new_journal_types()
+        if node_types:
+            self.reload(node_types)
+
+    def reload(self, node_types=None):
+        """
+        Re-reads ``node_types`` (default: all) from disk. Parsing happens in
+        a separate manager and the comparison with the loaded nodes under
+        the read lock, so readers only wait while changed nodes are swapped.
+        """
+        node_types = set(TYPE_TO_FILENAME_MAP if node_types is None else node_types)
+        with self._reload_lock:
+            fresh = DBManager(self.data_path)
+            loaded = {}
+            for node_type in node_types:
+                fresh._ensure_loaded(node_type)
+                loaded[node_type] = list(fresh._storage(node_type).values())
+
+            # Only this thread writes (under _reload_lock), so the diff holds
+            with self.lock.read():
+                changes = {t: self.db.changes(t, nodes) for t, nodes in loaded.items()}
+            with self.lock.write():
+                for node_type, (stale, changed) in changes.items():
+                    self.db.apply_changes(node_type, stale, changed)
+
+        names = ", ".join(sorted(TYPE_TO_STORAGE_MAP[t] for t in node_types))
+        print(f"[INFO] Reloaded {names} from {self.data_path.name}/")
@@ -0,0 +1,380 @@
+import json
+import sqlite3
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import fields
+from functools import lru_cache
+from pathlib import Path
+
+from scripts.db_manager import (
+    REFERENCE_FIELDS,
+    TYPE_TO_FILENAME_MAP,
+    TYPE_TO_STORAGE_MAP,
+    DBManager,
+    _constructor,
+    _write_atomic,
+    dump_yaml,
+    node_references,
+    node_to_dict,
+)
+
+# How long a writer waits for another process's transaction before failing
+BUSY_TIMEOUT_MS = 5000
+
+MODEL_BY_NAME = {cls.__name__: cls for cls in TYPE_TO_STORAGE_MAP}
+
+
+# --- SCHEMA ---
+# One table per node type (named like its DBManager dict). List-of-id fields
+# get a join table <table>_<field>(node_id, position, target_id); other lists
+# (a question's answer steps) are stored as JSON. inline_refs holds the
+# #def("...")-style references found in markup, so every inbound edge of a
+# node can be found with indexed lookups.
+@lru_cache(maxsize=None)
+def _layout(model_class):
+    """Splits a model's fields into (columns, JSON columns, join-table fields)."""
+    columns, json_columns, joins = [], [], []
+    refs = REFERENCE_FIELDS.get(model_class, ())
+    for f in fields(model_class):
+        if "List" not in str(f.type):
+            columns.append(f.name)
+        elif f.name in refs:
+            joins.append(f.name)
+        else:
+            json_columns.append(f.name)
+    return tuple(columns), tuple(json_columns), tuple(joins)
+
+
+def _column_list(names):
+    return ", ".join(f'"{name}"' for name in names)
+
+
+def _schema_statements():
+    yield "CREATE TABLE IF NOT EXISTS nodes (id TEXT PRIMARY KEY, type TEXT NOT NULL)"
+    yield (
+        "CREATE TABLE IF NOT EXISTS inline_refs "
+        "(source_id TEXT NOT NULL, field TEXT NOT NULL, target_id TEXT NOT NULL)"
+    )
+    yield "CREATE INDEX IF NOT EXISTS inline_refs_target ON inline_refs (target_id)"
+    yield "CREATE INDEX IF NOT EXISTS inline_refs_source ON inline_refs (source_id)"
+    for model_class, table in TYPE_TO_STORAGE_MAP.items():
+        columns, json_columns, joins = _layout(model_class)
+        others = [c for c in columns + json_columns if c != "id"]
+        yield (
+            f"CREATE TABLE IF NOT EXISTS {table} "
+            f"(id TEXT PRIMARY KEY, {_column_list(others)})"
+        )
+        for column in columns:
+            if column in REFERENCE_FIELDS.get(model_class, ()):
+                yield (
+                    f"CREATE INDEX IF NOT EXISTS {table}_{column} "
+                    f'ON {table} ("{column}")'
+                )
+        for field_name in joins:
+            join = f"{table}_{field_name}"
+            yield (
+                f"CREATE TABLE IF NOT EXISTS {join} (node_id TEXT NOT NULL, "
+                "position INTEGER NOT NULL, target_id TEXT NOT NULL, "
+                "PRIMARY KEY (node_id, position))"
+            )
+            yield f"CREATE INDEX IF NOT EXISTS {join}_target ON {join} (target_id)"
+
+
+@lru_cache(maxsize=None)
+def _referrer_query():
+    """One UNION over every place a node id can be referenced from."""
+    parts = ["SELECT source_id, field FROM inline_refs WHERE target_id = :id"]
+    for model_class, table in TYPE_TO_STORAGE_MAP.items():
+        columns, _, joins = _layout(model_class)
+        for field_name in joins:
+            parts.append(
+                f"SELECT node_id, '{field_name}' FROM {table}_{field_name} "
+                "WHERE target_id = :id"
+            )
+        for column in columns:
+            if column in REFERENCE_FIELDS.get(model_class, ()):
+                parts.append(
+                    f"SELECT id, '{column}' FROM {table} WHERE \"{column}\" = :id"
+                )
+    return " UNION ".join(parts) + " ORDER BY 1, 2"
+
+
+class SQLiteDBManager(DBManager):
+    """
+    DBManager backed by a single SQLite file instead of data/*.yaml.
+
+    Each add/update/delete is one transaction whose checks (duplicate ids,
+    references to a node being deleted) run against the database, not this
+    process's copy, so several editors can share a bank safely. Reads go
+    through the usual lazily loaded dicts and indexes; edits made by other
+    processes are seen by instances opened after them.
+    """
+
+    def __init__(self, db_file):
+        super().__init__(None, use_snapshot=False, use_journal=False)
+        self.db_file = Path(db_file)
+        self._loaded = set()  # A path-less DBManager starts "fully loaded"
+        self._db_lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            self.db_file, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+        # WAL lets readers keep going while another process writes
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        with self._transaction() as conn:
+            for statement in _schema_statements():
+                conn.execute(statement)
+            self._add_missing_columns(conn)
+
+    def close(self):
+        self._conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        """BEGIN IMMEDIATE takes the write lock up front, so check + write is atomic."""
+        with self._db_lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    @contextmanager
+    def _snapshot(self):
+        """A read transaction: one consistent view across several queries."""
+        with self._db_lock:
+            self._conn.execute("BEGIN")
+            try:
+                yield self._conn
+            finally:
+                self._conn.execute("COMMIT")
+
+    def _add_missing_columns(self, conn):
+        # Fields added to a model after the database was created
+        for model_class, table in TYPE_TO_STORAGE_MAP.items():
+            columns, json_columns, _ = _layout(model_class)
+            existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+            for column in columns + json_columns:
+                if column not in existing:
+                    conn.execute(f'ALTER TABLE {table} ADD COLUMN "{column}"')
+
+    # --- LOADING ---
+    def _file_size(self, node_type):
+        table = TYPE_TO_STORAGE_MAP[node_type]
+        with self._db_lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def _load_file(self, filename, model_class):
+        table = TYPE_TO_STORAGE_MAP[model_class]
+        columns, json_columns, joins = _layout(model_class)
+        with self._snapshot() as conn:
+            lists = {}
+            for field_name in joins:
+                targets = defaultdict(list)
+                for node_id, target in conn.execute(
+                    f"SELECT node_id, target_id FROM {table}_{field_name} "
+                    "ORDER BY node_id, position"
+                ):
+                    targets[node_id].append(target)
+                lists[field_name] = targets
+
+            names = columns + json_columns
+            rows = conn.execute(f"SELECT {_column_list(names)} FROM {table}").fetchall()
+
+        build = _constructor(model_class)
+        for row in rows:
+            item = {name: value for name, value in zip(names, row) if value is not None}
+            for column in json_columns:
+                if column in item:
+                    item[column] = json.loads(item[column])
+            for field_name, targets in lists.items():
+                if item["id"] in targets:
+                    item[field_name] = targets[item["id"]]
+            try:
+                self._register(build(item), dirty=False)
+            except Exception as e:
+                print(f"[WARN] Skipping {item.get('id')} in {table}: {e}")
+
+    # --- WRITES ---
+    def _insert(self, conn, node):
+        model_class = type(node)
+        table = TYPE_TO_STORAGE_MAP[model_class]
+        columns, json_columns, joins = _layout(model_class)
+        data = node_to_dict(node)
+
+        values = [data.get(column) for column in columns]
+        values += [
+            json.dumps(data[column], ensure_ascii=False) if column in data else None
+            for column in json_columns
+        ]
+        placeholders = ", ".join("?" * len(values))
+        conn.execute(
+            f"INSERT INTO {table} ({_column_list(columns + json_columns)}) "
+            f"VALUES ({placeholders})",
+            values,
+        )
+        for field_name in joins:
+            ids = data.get(field_name) or []
+            if isinstance(ids, str):
+                ids = [ids]  # Some YAML entries hold a single id as a string
+            conn.executemany(
+                f"INSERT INTO {table}_{field_name} VALUES (?, ?, ?)",
+                [(node.id, i, target) for i, target in enumerate(ids)],
+            )
+        structural = REFERENCE_FIELDS.get(model_class, ())
+        conn.executemany(
+            "INSERT INTO inline_refs VALUES (?, ?, ?)",
+            [
+                (node.id, field_name, target)
+                for field_name, target in node_references(node)
+                if field_name not in structural
+            ],
+        )
+
+    def _remove(self, conn, node_id, model_class):
+        table = TYPE_TO_STORAGE_MAP[model_class]
+        conn.execute(f"DELETE FROM {table} WHERE id = ?", (node_id,))
+        for field_name in _layout(model_class)[2]:
+            conn.execute(
+                f"DELETE FROM {table}_{field_name} WHERE node_id = ?", (node_id,)
+            )
+        conn.execute("DELETE FROM inline_refs WHERE source_id = ?", (node_id,))
+
+    def _stored_type(self, conn, node_id):
+        row = conn.execute("SELECT type FROM nodes WHERE id = ?", (node_id,)).fetchone()
+        if row is None:
+            raise ValueError(f"Node with id '{node_id}' not found.")
+        return MODEL_BY_NAME[row[0]]
+
+    def add_node(self, node):
+        """Adds a new node. Raises ValueError if the id is already taken."""
+        self._ensure_loaded(type(node))
+        with self._transaction() as conn:
+            try:
+                conn.execute(
+                    "INSERT INTO nodes (id, type) VALUES (?, ?)",
+                    (node.id, type(node).__name__),
+                )
+            except sqlite3.IntegrityError:
+                raise ValueError(f"Node with id '{node.id}' already exists.") from None
+            self._insert(conn, node)
+        if node.id in self._nodes:
+            self._unregister(node.id)  # Deleted by another process since we loaded
+        self._register(node, dirty=False)
+
+    def update_node(self, node):
+        """Replaces the stored node that has the same id."""
+        self._ensure_loaded(type(node))
+        with self._transaction() as conn:
+            self._remove(conn, node.id, self._stored_type(conn, node.id))
+            conn.execute(
+                "UPDATE nodes SET type = ? WHERE id = ?", (type(node).__name__, node.id)
+            )
+            self._insert(conn, node)
+        if node.id in self._nodes:
+            self._unregister(node.id)
+        self._register(node, dirty=False)
+
+    def delete_node(self, node_id):
+        """
+        Deletes a node. Raises ValueError if another node still references it
+        (checked inside the transaction, so a concurrent edit cannot slip in).
+        """
+        with self._transaction() as conn:
+            model_class = self._stored_type(conn, node_id)
+            refs = conn.execute(_referrer_query(), {"id": node_id})
+            for source_id, field_name in refs:
+                if source_id != node_id:
+                    raise ValueError(
+                        f"Cannot delete node '{node_id}': referenced by node "
+                        f"'{source_id}' ({field_name})."
+                    )
+            self._remove(conn, node_id, model_class)
+            conn.execute("DELETE FROM nodes WHERE id = ?", (node_id,))
+        if node_id in self._nodes:
+            self._unregister(node_id)
+
+    def referrers(self, node_id):
+        """Returns the (source id, field) pairs that reference ``node_id``, sorted."""
+        with self._snapshot() as conn:
+            refs = conn.execute(_referrer_query(), {"id": node_id})
+            return [tuple(row) for row in refs]
+
+    # --- PERSISTENCE ---
+    def save(self):
+        """Nothing to write: every edit was committed when it was made."""
+        self.dirty.clear()
+        self._dirty_ids.clear()
+
+    def compact(self):
+        self.save()
+
+    def has_flat_files(self):
+        return False
+
+    def migrate(self, layout):
+        raise ValueError("A SQLite bank has no data/ layout; use export-yaml instead.")
+
+
+def import_yaml(data_path, db_file):
+    """
+    Replaces the contents of ``db_file`` with the YAML bank in ``data_path``
+    (flat or sharded, pending journal entries included). Returns the number
+    of nodes imported.
+    """
+    nodes = list(DBManager(Path(data_path)).nodes.values())
+    db = SQLiteDBManager(db_file)
+    try:
+        with db._transaction() as conn:
+            tables = ["nodes", "inline_refs"]
+            for model_class, table in TYPE_TO_STORAGE_MAP.items():
+                tables.append(table)
+                tables += [f"{table}_{name}" for name in _layout(model_class)[2]]
+            for table in tables:
+                conn.execute(f"DELETE FROM {table}")
+            conn.executemany(
+                "INSERT INTO nodes (id, type) VALUES (?, ?)",
+                [(node.id, type(node).__name__) for node in nodes],
+            )
+            for node in nodes:
+                db._insert(conn, node)
+    finally:
+        db.close()
+    return len(nodes)
+
+
+def export_yaml(db_file, data_path):
+    """
+    Writes the bank in ``db_file`` to ``data_path`` as flat YAML files, the
+    layout lib.typ reads. Returns the number of nodes exported.
+    """
+    data_path = Path(data_path)
+    data_path.mkdir(parents=True, exist_ok=True)
+    target = DBManager(data_path)
+    if target.is_sharded():
+        raise ValueError(
+            f"'{data_path}' uses the sharded layout; "
+            "run 'manage.py migrate flat' first."
+        )
+
+    db = SQLiteDBManager(db_file)
+    try:
+        count = 0
+        for node_type, filename in TYPE_TO_FILENAME_MAP.items():
+            nodes = sorted(
+                getattr(db, TYPE_TO_STORAGE_MAP[node_type]).values(), key=lambda n: n.id
+            )
+            path = data_path / filename
+            if nodes:
+                _write_atomic(path, dump_yaml([node_to_dict(node) for node in nodes]))
+            elif path.exists():
+                path.unlink()
+            count += len(nodes)
+    finally:
+        db.close()
+    if target.journal is not None:
+        target.journal.clear()  # The export supersedes edits still in the journal
+    return count
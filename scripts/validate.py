@@ -0,0 +1,289 @@
+"""
+Validation engine for the data bank (schema + referential integrity).
+
+Every YAML file, or chunk of shard files, is parsed exactly once, in a
+process pool when the bank is large enough. Workers check each item against
+its model and return the ids and references they found; the parent then
+checks that ids are unique and that every reference resolves.
+
+    python scripts/validate.py [--data DIR] [--jobs N] [--json]
+
+Exit codes (for pre-commit hooks and CI):
+    0  the bank is valid
+    1  problems were found
+    2  the bank could not be validated (e.g. no data directory)
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+# --- SETUP PATHS ---
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from scripts.db_manager import (  # noqa: E402
+    JOURNAL_FILE,
+    PARALLEL_LOAD_MIN_FILES,
+    SHARD_CHUNK_SIZE,
+    TYPE_TO_FILENAME_MAP,
+    TYPE_TO_STORAGE_MAP,
+    _build_node,
+    _valid_keys,
+    iter_yaml_items,
+    node_references,
+)
+from scripts.journal import Journal  # noqa: E402
+
+EXIT_OK = 0
+EXIT_PROBLEMS = 1
+EXIT_FAILED = 2
+
+# A few big flat files are also worth spreading over the pool
+PARALLEL_MIN_BYTES = 8 * 1024 * 1024
+
+# Issue kinds, as reported by audit_data.py and check_integrity.py respectively
+SCHEMA_CHECKS = ("read", "schema", "unknown-field")
+INTEGRITY_CHECKS = ("duplicate-id", "broken-reference")
+
+
+def _issue(check, file, message, node_id=None):
+    return {"check": check, "file": file, "id": node_id, "message": message}
+
+
+def _check_item(item, index, model_class, valid_keys, file):
+    """Returns (node or None, issues) for one raw item."""
+    if not isinstance(item, dict):
+        return None, [_issue("schema", file, f"Item {index} is not a mapping.")]
+    node_id = item.get("id")
+    if not node_id:
+        return None, [_issue("schema", file, f"Item {index} has no id.")]
+
+    issues = []
+    unknown = sorted(set(item) - valid_keys)
+    if unknown:
+        issues.append(
+            _issue("unknown-field", file, f"Unknown fields: {unknown}", node_id)
+        )
+    try:
+        node = _build_node(model_class, item)
+    except Exception as e:
+        issues.append(_issue("schema", file, str(e), node_id))
+        return None, issues
+    return node, issues
+
+
+def _check_files(model_class, paths, data_path):
+    """
+    Checks whole files. Runs in pool workers, so nothing is printed: each
+    file's results (ids, references, issues, timing) are returned instead.
+    """
+    valid_keys = _valid_keys(model_class)
+    results = []
+    for path in paths:
+        start = time.perf_counter()
+        file = path.relative_to(data_path).as_posix()
+        result = {"file": file, "items": 0, "ids": [], "refs": [], "issues": []}
+        try:
+            with open(path, "rb") as f:
+                # Streamed, so huge files are checked one item at a time
+                for index, item in enumerate(iter_yaml_items(f)):
+                    result["items"] += 1
+                    node, issues = _check_item(
+                        item, index, model_class, valid_keys, file
+                    )
+                    result["issues"].extend(issues)
+                    if node is None:
+                        continue
+                    result["ids"].append(node.id)
+                    result["refs"].extend(
+                        (node.id, field, target)
+                        for field, target in node_references(node)
+                    )
+        except Exception as e:
+            result["issues"].append(_issue("read", file, f"Could not read: {e}"))
+        result["seconds"] = time.perf_counter() - start
+        results.append(result)
+    return results
+
+
+def _tasks(data_path):
+    """Splits the bank into (model class, [paths]) units of work."""
+    tasks = []
+    for model_class, filename in TYPE_TO_FILENAME_MAP.items():
+        file_path = data_path / filename
+        shard_dir = file_path.with_suffix("")
+        if shard_dir.is_dir():
+            paths = sorted(shard_dir.glob("*.yaml"))
+            for i in range(0, len(paths), SHARD_CHUNK_SIZE):
+                tasks.append((model_class, paths[i : i + SHARD_CHUNK_SIZE]))
+        elif file_path.exists():
+            tasks.append((model_class, [file_path]))
+    return tasks
+
+
+def _run(tasks, data_path, jobs):
+    """Runs the file checks, in a process pool unless the bank is small."""
+    files = [path for _, paths in tasks for path in paths]
+    if jobs is None:
+        size = sum(path.stat().st_size for path in files)
+        big = len(files) >= PARALLEL_LOAD_MIN_FILES or size >= PARALLEL_MIN_BYTES
+        jobs = os.cpu_count() if big else 1
+    if jobs > 1 and len(tasks) > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                futures = [
+                    (m, pool.submit(_check_files, m, paths, data_path))
+                    for m, paths in tasks
+                ]
+                return [(m, f.result()) for m, f in futures], jobs
+        except Exception as e:
+            print(f"[WARN] Parallel validation failed, running serially: {e}")
+    return [(m, _check_files(m, paths, data_path)) for m, paths in tasks], 1
+
+
+def validate(data_path: Path, jobs=None) -> dict:
+    """
+    Validates the bank under ``data_path`` and returns a JSON-ready report:
+    counts, timings, and a list of issues (empty if the bank is valid).
+    """
+    start = time.perf_counter()
+    data_path = Path(data_path)
+    report = {
+        "data_path": str(data_path),
+        "ok": False,
+        "files": 0,
+        "items": 0,
+        "counts": {},
+        "errors": 0,
+        "warnings": [],
+        "workers": 0,
+        "timings": {},
+        "issues": [],
+    }
+    if not data_path.is_dir():
+        report["issues"].append(
+            _issue("read", str(data_path), "Data directory not found.")
+        )
+        report["errors"] = 1
+        return report
+
+    # 1. Schema checks, one pass per file
+    results, report["workers"] = _run(_tasks(data_path), data_path, jobs)
+    parsed = time.perf_counter()
+
+    # 2. Ids must be unique across the whole bank (they share one namespace)
+    issues = []
+    owner = {}
+    for model_class, file_results in results:
+        storage = TYPE_TO_STORAGE_MAP[model_class]
+        for result in file_results:
+            report["files"] += 1
+            report["items"] += result["items"]
+            counts = report["counts"]
+            counts[storage] = counts.get(storage, 0) + len(result["ids"])
+            issues.extend(result["issues"])
+            for node_id in result["ids"]:
+                if node_id in owner:
+                    issues.append(
+                        _issue(
+                            "duplicate-id",
+                            result["file"],
+                            f"Id already used in {owner[node_id]}.",
+                            node_id,
+                        )
+                    )
+                else:
+                    owner[node_id] = result["file"]
+
+    # 3. Every reference must point to a node of the bank
+    for _, file_results in results:
+        for result in file_results:
+            for source, field, target in result["refs"]:
+                if target not in owner:
+                    issues.append(
+                        _issue(
+                            "broken-reference",
+                            result["file"],
+                            f"'{field}' points to unknown id '{target}'.",
+                            source,
+                        )
+                    )
+    resolved = time.perf_counter()
+
+    pending = len(Journal(data_path / JOURNAL_FILE))
+    if pending:
+        report["warnings"].append(
+            f"{pending} journaled edits are not in the YAML files yet "
+            "(run 'python scripts/manage.py compact')."
+        )
+
+    report["issues"] = issues
+    report["errors"] = len(issues)
+    report["ok"] = not issues
+    report["timings"] = {
+        "schema": round(parsed - start, 4),
+        "references": round(resolved - parsed, 4),
+        "total": round(time.perf_counter() - start, 4),
+        "files": {
+            result["file"]: round(result["seconds"], 4)
+            for _, file_results in results
+            for result in file_results
+        },
+    }
+    return report
+
+
+def exit_code(report, checks=None) -> int:
+    """0/1/2 as documented above; ``checks`` limits which issues count."""
+    if report["files"] == 0 and not report["ok"]:
+        return EXIT_FAILED
+    issues = [i for i in report["issues"] if checks is None or i["check"] in checks]
+    return EXIT_PROBLEMS if issues else EXIT_OK
+
+
+def print_report(report):
+    """Human-readable summary of a report."""
+    for issue in report["issues"]:
+        where = f"[{issue['id']}] " if issue["id"] else ""
+        message = f"{where}{issue['message']} ({issue['check']})"
+        print(f"[ERROR] {issue['file']}: {message}")
+    for warning in report["warnings"]:
+        print(f"[WARN] {warning}")
+    counts = ", ".join(f"{n} {name}" for name, n in report["counts"].items())
+    print(
+        f"[INFO] Checked {report['items']} items in {report['files']} files "
+        f"({counts}) in {report['timings'].get('total', 0):.2f}s "
+        f"with {report['workers']} worker(s)."
+    )
+    if report["ok"]:
+        print("[INFO] Validation passed.")
+    else:
+        print(f"[ERROR] Validation failed with {report['errors']} problems.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validate the data bank.")
+    parser.add_argument(
+        "--data", type=Path, default=PROJECT_ROOT / "data", help="Data directory."
+    )
+    parser.add_argument(
+        "--jobs", type=int, help="Worker processes (default: auto, by bank size)."
+    )
+    parser.add_argument("--json", action="store_true", help="Print a JSON report.")
+    args = parser.parse_args(argv)
+
+    report = validate(args.data, jobs=args.jobs)
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        print_report(report)
+    return exit_code(report)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
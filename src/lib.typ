@@ -11,13 +11,24 @@
 #let c-gray      = rgb("#666666") // Gray
 
 // --- 2. DATA LOADING ---
-#let questions = yaml("../data/questions.yaml")
-#let definitions = yaml("../data/definitions.yaml")
-#let tools = yaml("../data/tools.yaml")
-#let examples = yaml("../data/examples.yaml")
-#let mistakes = yaml("../data/mistakes.yaml")
-#let lectures = yaml("../data/lectures.yaml")
-#let tutorials = yaml("../data/tutorials.yaml")
+// build_exam.py can pass a slim JSON bundle holding only the nodes an exam
+// needs: `typst compile --input bundle=/path/to/bundle.json ...`
+// Collections missing from the bundle (or no bundle at all) come from data/.
+// A sharded data/ (one file per node) has no data/<name>.yaml, so compiles
+// against it must always pass a bundle.
+#let bundle = {
+  let path = sys.inputs.at("bundle", default: none)
+  if path == none { (:) } else { json(path) }
+}
+#let load-data(name) = if name in bundle { bundle.at(name) } else { yaml("../data/" + name + ".yaml") }
+
+#let questions = load-data("questions")
+#let definitions = load-data("definitions")
+#let tools = load-data("tools")
+#let examples = load-data("examples")
+#let mistakes = load-data("mistakes")
+#let lectures = load-data("lectures")
+#let tutorials = load-data("tutorials")
 
 #let to-dict(list) = {
   let d = (:)
@@ -0,0 +1,70 @@
+import dataclasses
+import gc
+import sys
+import tracemalloc
+from pathlib import Path
+
+# --- SETUP PATHS ---
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from bench_yaml import synthetic_bank  # noqa: E402
+from scripts.models import AnswerStep, Question  # noqa: E402
+
+# CONFIGURATION
+QUESTION_COUNT = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+
+
+def unslotted(cls, **overrides):
+    """A plain (__dict__-based) dataclass with the same fields as ``cls``."""
+    specs = []
+    for f in dataclasses.fields(cls):
+        if f.default_factory is not dataclasses.MISSING:
+            spec = dataclasses.field(default_factory=f.default_factory)
+        elif f.default is not dataclasses.MISSING:
+            spec = dataclasses.field(default=f.default)
+        else:
+            spec = dataclasses.field()
+        specs.append((f.name, f.type, spec))
+    return dataclasses.make_dataclass(f"Dict{cls.__name__}", specs, namespace=overrides)
+
+
+DictAnswerStep = unslotted(AnswerStep)
+
+
+def _dict_post_init(self):
+    self.answer_steps = [DictAnswerStep(**step) for step in self.answer_steps]
+
+
+DictQuestion = unslotted(Question, __post_init__=_dict_post_init)
+
+
+def bytes_per_node(question_class, data):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    nodes = [question_class(**item) for item in data]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # Each question also owns 2 answer steps, counted in its bytes
+    return (after - before) / len(nodes), nodes
+
+
+def benchmark():
+    print(f"MODEL MEMORY BENCHMARK ({QUESTION_COUNT} questions, 2 steps each)")
+    print("-" * 60)
+    data = synthetic_bank(QUESTION_COUNT)
+
+    dict_bytes, dict_nodes = bytes_per_node(DictQuestion, data)
+    del dict_nodes
+    slot_bytes, slot_nodes = bytes_per_node(Question, data)
+    assert not hasattr(slot_nodes[0], "__dict__")
+    assert not hasattr(slot_nodes[0].answer_steps[0], "__dict__")
+
+    print(f"__dict__ models  {dict_bytes:8.0f} bytes/question")
+    print(f"slotted models   {slot_bytes:8.0f} bytes/question")
+    print(f"Saved {1 - slot_bytes / dict_bytes:.0%} per question (strings shared).")
+
+
+if __name__ == "__main__":
+    benchmark()
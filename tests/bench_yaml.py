@@ -0,0 +1,82 @@
+import sys
+import time
+from pathlib import Path
+
+import yaml
+
+# --- SETUP PATHS ---
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from scripts.db_manager import dump_yaml, load_yaml, node_to_dict  # noqa: E402
+from scripts.models import Question, AnswerStep  # noqa: E402
+
+# CONFIGURATION
+QUESTION_COUNT = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+TOPICS = ["Calculus", "Set Theory", "Linear Algebra", "Limits", "Topology"]
+
+
+def synthetic_bank(n):
+    """Questions shaped like data/questions.yaml (math strings, nested steps)."""
+    return [
+        node_to_dict(
+            Question(
+                id=f"qn-bench-{i}",
+                year=2000 + i % 25,
+                lecturer=f"Prof. {i % 40}",
+                topic=TOPICS[i % len(TOPICS)],
+                given=f"Let $f(x) = x^{i % 7} e^x$.",
+                to_prove=f"Calculate $integral_0^{i % 9} f(x) dif x$.",
+                hint="Use integration by parts twice.",
+                answer_steps=[
+                    AnswerStep(
+                        type="Calculation", title="Step 1", content="Let $u = x^2$."
+                    ),
+                    AnswerStep(
+                        type="Result", title="Final Answer", content="$e - 2$.\nDone."
+                    ),
+                ],
+                tools=["tool-ibp"],
+            )
+        )
+        for i in range(n)
+    ]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def benchmark():
+    print(f"YAML BENCHMARK ({QUESTION_COUNT} questions)")
+    print("-" * 60)
+    data = synthetic_bank(QUESTION_COUNT)
+
+    backends = [("pure Python", yaml.SafeLoader, yaml.SafeDumper)]
+    if yaml.__with_libyaml__:
+        backends.append(("libyaml (C)", yaml.CSafeLoader, yaml.CSafeDumper))
+    else:
+        print("libyaml not available: only the pure-Python path is measured.")
+
+    outputs = {}
+    for name, loader, dumper in backends:
+        text, t_dump = timed(lambda: dump_yaml(data, dumper=dumper))
+        loaded, t_load = timed(lambda: load_yaml(text, loader=loader))
+        assert loaded == data, f"{name}: round trip changed the data"
+        outputs[name] = text
+        print(
+            f"{name:<12} save {t_dump:6.2f}s   load {t_load:6.2f}s   "
+            f"({len(text) / 1e6:.1f} MB)"
+        )
+
+    if len(set(outputs.values())) == 1:
+        print("OK - both emitters produced byte-identical output.")
+    else:
+        print("FAILED! Emitters disagree on the serialized bank.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    benchmark()
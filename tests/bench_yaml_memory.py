@@ -0,0 +1,75 @@
+import gc
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+# --- SETUP PATHS ---
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from bench_yaml import synthetic_bank  # noqa: E402
+from scripts.db_manager import (  # noqa: E402
+    _build_node,
+    dump_yaml,
+    iter_yaml_items,
+    load_yaml,
+)
+from scripts.models import Question  # noqa: E402
+
+# CONFIGURATION
+QUESTION_COUNT = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+
+
+def load_whole(path):
+    """The old loader: the full document as a list of dicts, then the nodes."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = load_yaml(f.read())
+    return {item["id"]: _build_node(Question, item) for item in data}
+
+
+def load_streaming(path):
+    with open(path, "rb") as f:
+        return {item["id"]: _build_node(Question, item) for item in iter_yaml_items(f)}
+
+
+def measure(fn, path):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    nodes = fn(path)
+    elapsed = time.perf_counter() - start
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return nodes, elapsed, retained, peak
+
+
+def benchmark():
+    print(f"YAML LOADER MEMORY BENCHMARK ({QUESTION_COUNT} questions)")
+    print("-" * 60)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "questions.yaml"
+        path.write_text(dump_yaml(synthetic_bank(QUESTION_COUNT)), encoding="utf-8")
+        print(f"File size: {path.stat().st_size / 1e6:.1f} MB")
+
+        results = {}
+        for name, fn in [("whole file", load_whole), ("streaming", load_streaming)]:
+            nodes, elapsed, retained, peak = measure(fn, path)
+            results[name] = nodes
+            # Overhead = memory used while loading beyond the nodes that are kept
+            print(
+                f"{name:<11} {elapsed:6.2f}s   peak {peak / 1e6:7.1f} MB   "
+                f"nodes {retained / 1e6:7.1f} MB   "
+                f"overhead {(peak - retained) / 1e6:7.1f} MB"
+            )
+
+    if results["whole file"] == results["streaming"]:
+        print("OK - both loaders built identical nodes.")
+    else:
+        print("FAILED! The loaders disagree.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    benchmark()
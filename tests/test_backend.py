@@ -1,3 +1,6 @@
+import os
+import pickle
+import tempfile
 import unittest
 from unittest.mock import patch, mock_open
 from pathlib import Path
@@ -11,10 +14,13 @@ from scripts.models import (
     Definition,
     Example,
     ExampleType,
+    Mistake,
     Severity,
     AnswerStep,
+    Question,
 )
-from scripts.db_manager import DBManager
+from scripts.db_manager import DBManager, dump_yaml, iter_yaml_items, load_yaml
+import yaml
 
 
 class TestModels(unittest.TestCase):
@@ -27,11 +33,48 @@ class TestModels(unittest.TestCase):
         d = Definition(id="def-1", term="T", content="C")
         self.assertEqual(d.term, "T")
 
+    def test_models_are_slotted(self):
+        q = Question(
+            id="q-1",
+            year=2023,
+            lecturer="X",
+            topic="T",
+            given="g",
+            to_prove="p",
+            answer_steps=[{"type": "Proof", "title": "S", "content": "c"}],
+        )
+        self.assertFalse(hasattr(q, "__dict__"))
+        self.assertIsInstance(q.answer_steps[0], AnswerStep)
+        self.assertEqual(pickle.loads(pickle.dumps(q)), q)  # Snapshots pickle nodes
+
     def test_enums(self):
         self.assertEqual(ExampleType("Standard"), ExampleType.STANDARD)
         with self.assertRaises(ValueError):
             Severity("Super-Critical")
 
+    def test_repeated_values_are_normalized(self):
+        self.assertIs(Severity("Critical"), Severity.CRITICAL)
+        self.assertIs(
+            Mistake(id="m", description="d", severity="Minor").severity, Severity.MINOR
+        )
+        ex = Example(id="e", name="E", content="c", type="counter-example")
+        self.assertIs(ex.type, ExampleType.COUNTER_EXAMPLE)
+        self.assertEqual(ex.type, "Counter-Example")  # Still compares as a string
+        # Messages show the value, not "ExampleType.COUNTER_EXAMPLE"
+        self.assertEqual(f"{ex.type}, {Severity.CRITICAL}", "Counter-Example, critical")
+        self.assertEqual(Example(id="f", name="F", content="c", type="Odd").type, "Odd")
+
+        # Equal topics read from different places share one string object
+        a, b = ("".join(["Lim", "its"]) for _ in range(2))
+        self.assertIsNot(a, b)
+        qs = [
+            Question(
+                id=f"q-{i}", year=2023, lecturer="X", topic=t, given="g", to_prove="p"
+            )
+            for i, t in enumerate((a, b))
+        ]
+        self.assertIs(qs[0].topic, qs[1].topic)
+
 
 class TestAssessmentEngine(unittest.TestCase):
     """Specific tests for Phase 5 (Questions, Answers)."""
@@ -135,5 +178,430 @@ class TestDatabaseManager(unittest.TestCase):
         self.assertNotIn("def-old", updated_ex.related_definition_ids)
 
 
+class TestBundle(unittest.TestCase):
+    """DBManager.bundle returns exactly the nodes a render needs."""
+
+    def test_transitive_and_inline_references(self):
+        db = DBManager()
+        db.add_node(Definition(id="def-root", term="Root", content="..."))
+        db.add_node(Definition(id="def-inline", term="Inline", content="..."))
+        db.add_node(Definition(id="def-other", term="Other", content="..."))
+        db.add_node(
+            Example(
+                id="ex-child",
+                name="Child",
+                content='See #def("def-inline").',
+                related_definition_ids=["def-root"],
+            )
+        )
+
+        bundle = db.bundle(["ex-child"])
+        self.assertEqual([e["id"] for e in bundle["examples"]], ["ex-child"])
+        self.assertEqual(
+            [d["id"] for d in bundle["definitions"]], ["def-inline", "def-root"]
+        )
+        self.assertEqual(bundle["questions"], [])
+
+        # The snapshot handed to compile jobs holds the same nodes
+        subset = db.subset(["ex-child"])
+        self.assertEqual(set(subset.nodes), {"ex-child", "def-inline", "def-root"})
+        self.assertIs(subset.examples["ex-child"], db.examples["ex-child"])
+        self.assertEqual(subset.bundle(["ex-child"]), bundle)
+
+
+class TestReferrers(unittest.TestCase):
+    """The inbound-edge index tracks references through add/update/delete."""
+
+    def test_referrers_and_guarded_delete(self):
+        db = DBManager()
+        db.add_node(Definition(id="def-root", term="Root", content="..."))
+        db.add_node(
+            Example(
+                id="ex-child",
+                name="Child",
+                content='Uses #def("def-root") inline too.',
+                related_definition_ids=["def-root"],
+            )
+        )
+        self.assertEqual(
+            db.referrers("def-root"),
+            [("ex-child", "content"), ("ex-child", "related_definition_ids")],
+        )
+        with self.assertRaisesRegex(ValueError, "referenced by node 'ex-child'"):
+            db.delete_node("def-root")
+
+        db.update_node(Example(id="ex-child", name="Child", content="..."))
+        self.assertEqual(db.referrers("def-root"), [])
+        db.delete_node("def-root")
+        self.assertNotIn("def-root", db.nodes)
+
+
+class TestSearchIndex(unittest.TestCase):
+    """Full-text search ranks, prefix-matches and follows edits."""
+
+    def test_ranked_prefix_search(self):
+        db = DBManager()
+        db.add_node(Definition(id="def-group", term="Group", content="A set with..."))
+        db.add_node(
+            Definition(id="def-coset", term="Coset", content="Defined for a group G.")
+        )
+        db.build_search_index()
+        db.add_node(
+            Question(
+                id="q-1",
+                year=2023,
+                lecturer="X",
+                topic="Rings",
+                given="Let R be a ring.",
+                to_prove="...",
+                answer_steps=[
+                    AnswerStep(type="step", title="", content="Use groupoids.")
+                ],
+            )
+        )
+
+        def ids(nodes):
+            return [n.id for n in nodes]
+
+        # Title match outranks body match; "grou" prefix-matches "groupoids"
+        self.assertEqual(ids(db.search("group")), ["def-group", "def-coset", "q-1"])
+        self.assertEqual(ids(db.search("grou", node_type=Question)), ["q-1"])
+        self.assertEqual(ids(db.search("group defined")), ["def-coset"])
+        self.assertEqual(db.search("lattice"), [])
+
+        db.delete_node("def-group")
+        db.update_node(Definition(id="def-coset", term="Coset", content="..."))
+        self.assertEqual(ids(db.search("group")), ["q-1"])
+
+
+class TestQuestionIndex(unittest.TestCase):
+    """query_questions stays consistent with add/update/delete."""
+
+    def _question(self, qid, topic, year=2023, lecturer="Dr. Cohen", tools=()):
+        return Question(
+            id=qid,
+            year=year,
+            lecturer=lecturer,
+            topic=topic,
+            given="...",
+            to_prove="...",
+            tools=list(tools),
+        )
+
+    def test_filters_and_maintenance(self):
+        db = DBManager()
+        db.add_node(self._question("q-2", "Group Theory", tools=["tool-lagrange"]))
+        db.add_node(self._question("q-1", "Group Actions", year=2024))
+        db.add_node(self._question("q-3", "Rings", lecturer="Dr. Levi"))
+
+        def ids(qs):
+            return [q.id for q in qs]
+
+        self.assertEqual(ids(db.query_questions(topic="group")), ["q-1", "q-2"])
+        self.assertEqual(ids(db.query_questions(topic="group", year=2023)), ["q-2"])
+        self.assertEqual(ids(db.query_questions(lecturer="levi")), ["q-3"])
+        self.assertEqual(ids(db.query_questions(tool="tool-lagrange")), ["q-2"])
+        self.assertEqual(ids(db.query_questions()), ["q-1", "q-2", "q-3"])
+
+        db.update_node(self._question("q-2", "Fields"))
+        self.assertEqual(ids(db.query_questions(topic="group")), ["q-1"])
+        self.assertEqual(db.query_questions(tool="tool-lagrange"), [])
+
+        db.delete_node("q-1")
+        self.assertEqual(db.query_questions(topic="group"), [])
+        self.assertEqual(db.query_questions(year=2024), [])
+
+    def test_orders_kept_sorted_across_edits(self):
+        db = DBManager()
+        for i in range(20):
+            db.add_node(self._question(f"q-{i:02}", "Groups", year=2000 + i % 5))
+        db.query_questions(sort="year")  # Builds the order
+
+        db.update_node(self._question("q-00", "Groups", year=2100))
+        db.delete_node("q-01")
+        db.add_node(self._question("q-99", "Groups", year=1999))
+        expected = sorted(db.questions.values(), key=lambda q: (q.year, q.id))
+        # A large match set walks the stored order, a small one is sorted
+        self.assertEqual(db.query_questions(topic="group", sort="year"), expected)
+        self.assertEqual(
+            db.query_questions(year=2100, sort="year"), [db.questions["q-00"]]
+        )
+
+    def test_sorted_queries(self):
+        db = DBManager()
+        db.add_node(self._question("q-1", "rings", year=2021))
+        db.add_node(self._question("q-2", "Groups", year=2024))
+        db.add_node(self._question("q-3", "Fields", year=2021))
+
+        def ids(qs):
+            return [q.id for q in qs]
+
+        self.assertEqual(ids(db.query_questions(sort="topic")), ["q-3", "q-2", "q-1"])
+        self.assertEqual(ids(db.query_questions(sort="year")), ["q-1", "q-3", "q-2"])
+        self.assertEqual(
+            ids(db.query_questions(year=2021, sort="topic")), ["q-3", "q-1"]
+        )
+        with self.assertRaises(ValueError):
+            db.query_questions(sort="difficulty")
+
+
+class TestSnapshotCache(unittest.TestCase):
+    """The pickled snapshot must never serve stale data."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.data_dir = Path(self.tmp.name)
+        self.defs_yaml = self.data_dir / "definitions.yaml"
+        self.defs_yaml.write_text(
+            "- id: def-a\n  term: A\n  content: first\n", encoding="utf-8"
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_snapshot_written_and_reused(self):
+        DBManager(self.data_dir).load_all()
+        self.assertTrue((self.data_dir / ".cache" / "definitions.pickle").exists())
+
+        with patch("scripts.db_manager.iter_yaml_items") as mock_load:
+            db = DBManager(self.data_dir)
+            self.assertEqual(db.definitions["def-a"].content, "first")
+            mock_load.assert_not_called()
+
+    def test_snapshot_invalidated_on_edit(self):
+        DBManager(self.data_dir).load_all()
+        # Same size, same mtime: only the content hash can tell them apart
+        stat = self.defs_yaml.stat()
+        self.defs_yaml.write_text(
+            "- id: def-a\n  term: A\n  content: other\n", encoding="utf-8"
+        )
+        os.utime(self.defs_yaml, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+        db = DBManager(self.data_dir)
+        self.assertEqual(db.definitions["def-a"].content, "other")
+
+    def test_snapshot_disabled(self):
+        DBManager(self.data_dir, use_snapshot=False).load_all()
+        self.assertFalse((self.data_dir / ".cache").exists())
+
+
+class TestStreamingLoader(unittest.TestCase):
+    """iter_yaml_items must agree with load_yaml on every parser."""
+
+    TEXT = (
+        "- &base\n  id: def-a\n  term: A\n  content: |\n    $x \\in G$\n"
+        "- id: def-b\n  tags: [1, 2.5, null, '3']\n  extra: *base\n"
+    )
+
+    def test_matches_load_yaml(self):
+        loaders = [yaml.SafeLoader]
+        if yaml.__with_libyaml__:
+            loaders.append(yaml.CSafeLoader)
+        for loader in loaders:
+            with self.subTest(loader=loader.__name__):
+                items = list(iter_yaml_items(self.TEXT, loader))
+                self.assertEqual(items, load_yaml(self.TEXT, loader))
+
+    def test_empty_and_invalid_documents(self):
+        self.assertEqual(list(iter_yaml_items("")), [])
+        self.assertEqual(list(iter_yaml_items("---\n")), [])
+        with self.assertRaises(ValueError):
+            list(iter_yaml_items("id: def-a\n"))
+
+
+class TestLazyLoading(unittest.TestCase):
+    """Collections are only parsed when first accessed."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.data_dir = Path(self.tmp.name)
+        (self.data_dir / "definitions.yaml").write_text(
+            "- id: def-a\n  term: A\n  content: first\n", encoding="utf-8"
+        )
+        (self.data_dir / "questions.yaml").write_text(
+            "- id: q-1\n  year: 2023\n  lecturer: X\n  topic: T\n"
+            "  given: g\n  to_prove: p\n",
+            encoding="utf-8",
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_only_touched_types_are_loaded(self):
+        db = DBManager(self.data_dir, use_snapshot=False)
+        with patch(
+            "scripts.db_manager.iter_yaml_items", wraps=iter_yaml_items
+        ) as mock_load:
+            self.assertIn("def-a", db.definitions)
+            self.assertEqual(mock_load.call_count, 1)
+            self.assertEqual(db.get_node("def-a").term, "A")
+            self.assertEqual(mock_load.call_count, 1)
+            self.assertIn("q-1", db.nodes)
+            self.assertEqual(mock_load.call_count, 2)
+
+    def test_journal_replayed_per_type(self):
+        db = DBManager(self.data_dir, use_snapshot=False)
+        db.add_node(Definition(id="def-b", term="B", content="..."))
+        db.delete_node("q-1")
+
+        db = DBManager(self.data_dir, use_snapshot=False)
+        self.assertEqual(sorted(db.definitions), ["def-a", "def-b"])
+        self.assertEqual(db.questions, {})
+
+    def test_save_rewrites_only_changed_files(self):
+        questions = self.data_dir / "questions.yaml"
+        untouched = questions.stat().st_mtime_ns
+
+        db = DBManager(self.data_dir, use_snapshot=False)
+        db.update_node(Definition(id="def-a", term="A", content="edited"))
+        db.compact()
+
+        self.assertEqual(questions.stat().st_mtime_ns, untouched)
+        self.assertEqual(list(self.data_dir.glob("*.tmp")), [])
+        self.assertEqual(
+            DBManager(self.data_dir).definitions["def-a"].content, "edited"
+        )
+
+
+class TestShardedLayout(unittest.TestCase):
+    """data/<name>/<id>.yaml holds the same bank as the flat files."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.data_dir = Path(self.tmp.name)
+        db = DBManager(self.data_dir)
+        for i in range(3):
+            db.add_node(Definition(id=f"def-{i}", term=f"T{i}", content="..."))
+        db.compact()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_migrate_round_trip(self):
+        self.assertEqual(DBManager(self.data_dir).migrate("sharded"), [Definition])
+        self.assertFalse((self.data_dir / "definitions.yaml").exists())
+        shards = sorted(p.name for p in (self.data_dir / "definitions").iterdir())
+        self.assertEqual(shards, ["def-0.yaml", "def-1.yaml", "def-2.yaml"])
+
+        db = DBManager(self.data_dir)
+        self.assertTrue(db.is_sharded(Definition))
+        self.assertEqual(sorted(db.definitions), ["def-0", "def-1", "def-2"])
+
+        self.assertEqual(DBManager(self.data_dir).migrate("flat"), [Definition])
+        self.assertFalse((self.data_dir / "definitions").exists())
+        self.assertEqual(len(DBManager(self.data_dir).definitions), 3)
+
+    def test_save_touches_only_changed_shards(self):
+        DBManager(self.data_dir).migrate("sharded")
+        shard_dir = self.data_dir / "definitions"
+        untouched = (shard_dir / "def-0.yaml").stat().st_mtime_ns
+
+        db = DBManager(self.data_dir)
+        db.update_node(Definition(id="def-1", term="T1", content="edited"))
+        db.delete_node("def-2")
+        db.compact()
+
+        self.assertEqual((shard_dir / "def-0.yaml").stat().st_mtime_ns, untouched)
+        self.assertFalse((shard_dir / "def-2.yaml").exists())
+        self.assertEqual(
+            DBManager(self.data_dir).definitions["def-1"].content, "edited"
+        )
+
+    def test_parallel_load(self):
+        DBManager(self.data_dir).migrate("sharded")
+        with (
+            patch("scripts.db_manager.PARALLEL_LOAD_MIN_FILES", 1),
+            patch("scripts.db_manager.SHARD_CHUNK_SIZE", 2),
+        ):
+            db = DBManager(self.data_dir, use_snapshot=False)
+            self.assertEqual(sorted(db.definitions), ["def-0", "def-1", "def-2"])
+
+
+class TestYamlBackend(unittest.TestCase):
+    """The C and pure-Python YAML paths must be interchangeable."""
+
+    TRICKY = [
+        "plain text",
+        "Let $f(x) = x^2$.",
+        "line one\nline two\n",
+        "  leading $y$ and trailing ",
+        "∀ε>0 \\exists δ",
+        "- $x$",
+        "# {c}",
+        "null",
+    ]
+
+    @unittest.skipUnless(yaml.__with_libyaml__, "PyYAML built without libyaml")
+    def test_c_dumper_byte_identical(self):
+        data = [{"id": f"n{i}", "content": s} for i, s in enumerate(self.TRICKY)]
+        py_text = dump_yaml(data, dumper=yaml.SafeDumper)
+        c_text = dump_yaml(data, dumper=yaml.CSafeDumper)
+        self.assertEqual(py_text, c_text)
+        self.assertIn("content: |-\n    Let $f(x) = x^2$.", c_text)
+        self.assertEqual(load_yaml(c_text, loader=yaml.SafeLoader), data)
+        self.assertEqual(load_yaml(c_text, loader=yaml.CSafeLoader), data)
+
+
+class TestJournal(unittest.TestCase):
+    """Mutations are journaled and survive until compacted into YAML."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.data_dir = Path(self.tmp.name)
+        self.defs_yaml = self.data_dir / "definitions.yaml"
+        self.defs_yaml.write_text(
+            "- id: def-a\n  term: A\n  content: first\n", encoding="utf-8"
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_mutations_replayed_on_load(self):
+        db = DBManager(self.data_dir)
+        db.add_node(Definition(id="def-b", term="B", content="second"))
+        db.delete_node("def-a")
+
+        # Nothing rewritten yet, but a fresh load sees both edits
+        self.assertIn("def-a", self.defs_yaml.read_text(encoding="utf-8"))
+        db = DBManager(self.data_dir)
+        self.assertEqual(set(db.definitions), {"def-b"})
+
+    def test_torn_last_line_ignored(self):
+        db = DBManager(self.data_dir)
+        db.add_node(Definition(id="def-b", term="B", content="second"))
+        with open(db.journal.path, "a", encoding="utf-8") as f:
+            f.write('{"op": "delete", "id": "def')  # Crash mid-append
+
+        db = DBManager(self.data_dir)
+        self.assertEqual(set(db.definitions), {"def-a", "def-b"})
+        db.add_node(Definition(id="def-c", term="C", content="third"))
+        self.assertEqual(
+            set(DBManager(self.data_dir).definitions), {"def-a", "def-b", "def-c"}
+        )
+
+    def test_compact_writes_yaml_and_clears_journal(self):
+        db = DBManager(self.data_dir)
+        db.add_node(Definition(id="def-b", term="B", content="second"))
+        db.compact()
+
+        self.assertFalse(db.journal.path.exists())
+        self.assertIn("def-b", self.defs_yaml.read_text(encoding="utf-8"))
+        self.assertEqual(set(DBManager(self.data_dir).definitions), {"def-a", "def-b"})
+
+    def test_compact_keeps_edits_journaled_by_other_processes(self):
+        db_a = DBManager(self.data_dir)
+        db_a.load_all()
+        # Another process journals an edit after A has loaded
+        DBManager(self.data_dir).add_node(Definition(id="def-b", term="B", content="x"))
+        db_a.add_node(Definition(id="def-c", term="C", content="y"))
+        db_a.compact()
+
+        self.assertFalse(db_a.journal.path.exists())
+        self.assertEqual(set(db_a.definitions), {"def-a", "def-b", "def-c"})
+        self.assertEqual(
+            set(DBManager(self.data_dir).definitions), {"def-a", "def-b", "def-c"}
+        )
+
+
 if __name__ == "__main__":
     unittest.main()
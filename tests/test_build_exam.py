@@ -1,3 +1,9 @@
+import json
+import os
+import stat
+import threading
+import tempfile
+import textwrap
 import unittest
 import sys
 from pathlib import Path
@@ -5,8 +11,45 @@ from unittest.mock import patch, MagicMock, call
 
 sys.path.append(str(Path(__file__).resolve().parent.parent))
 
-from scripts.build_exam import generate_exam, render_node_preview
-from scripts.models import Question
+from scripts import build_exam
+from scripts.db_manager import DBManager
+from scripts.build_exam import generate_batch, generate_exam, render_node_preview
+from scripts.models import Question, Definition
+
+# Stand-in for the typst CLI: "compiles" by copying the source to the output
+# and reports watch-mode status lines the same way typst does on stderr.
+FAKE_TYPST = textwrap.dedent("""
+    import sys, time
+    from pathlib import Path
+
+    args = sys.argv[1:]
+    src, out = Path(args[-2]), Path(args[-1])
+
+    def compile_once():
+        text = src.read_text(encoding="utf-8")
+        if "BROKEN" in text:
+            return "error: unknown variable: BROKEN"
+        out.write_text(text, encoding="utf-8")
+        return None
+
+    if args[0] == "compile":
+        error = compile_once()
+        print(error or "", file=sys.stderr)
+        sys.exit(1 if error else 0)
+
+    last = None
+    while True:
+        mtime = src.stat().st_mtime_ns
+        if mtime != last:
+            last = mtime
+            print("\\x1b[2J[12:00:00] compiling ...", file=sys.stderr, flush=True)
+            error = compile_once()
+            if error:
+                print("[12:00:00] compiled with errors\\n\\n" + error, file=sys.stderr, flush=True)
+            else:
+                print("[12:00:00] compiled successfully in 1.00ms", file=sys.stderr, flush=True)
+        time.sleep(0.01)
+    """)
 
 
 class TestBuildExam(unittest.TestCase):
@@ -123,5 +166,284 @@ class TestBuildExam(unittest.TestCase):
         mock_subprocess.assert_called_once()
 
 
+class TestParallelCompile(unittest.TestCase):
+    """Student and key PDFs are compiled at the same time."""
+
+    def setUp(self):
+        db = DBManager()
+        db.add_node(
+            Question(
+                id="qn-test",
+                topic="Calculus",
+                year=2023,
+                lecturer="Dr. Gemini",
+                given="g",
+                to_prove="p",
+            )
+        )
+        patchers = [
+            patch("scripts.build_exam.DBManager", return_value=db),
+            patch("scripts.build_exam.open", new_callable=unittest.mock.mock_open),
+        ]
+        for p in patchers:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_student_and_key_run_concurrently(self):
+        # Each compile blocks until the other has started; sequential runs time out
+        barrier = threading.Barrier(2, timeout=5)
+
+        def fake_run(cmd, **kwargs):
+            barrier.wait()
+            return MagicMock(returncode=0)
+
+        with patch("scripts.build_exam.subprocess.run", side_effect=fake_run):
+            std, key = generate_exam(specific_ids=["qn-test"], filename="t")
+        self.assertTrue(str(std).endswith("t.pdf"))
+        self.assertTrue(str(key).endswith("t_key.pdf"))
+
+    def test_out_dir_isolates_builds(self):
+        # Inside the project root, where the bundle path is resolved from
+        tmp = tempfile.TemporaryDirectory(dir=build_exam.PROJECT_ROOT)
+        self.addCleanup(tmp.cleanup)
+        out_dir = Path(tmp.name) / "job-1"
+        commands = []
+
+        def fake_run(cmd, **kwargs):
+            commands.append(cmd)
+            return MagicMock(returncode=0)
+
+        with patch("scripts.build_exam.subprocess.run", side_effect=fake_run):
+            std, key = generate_exam(specific_ids=["qn-test"], out_dir=out_dir)
+        self.assertEqual((std.parent, key.parent), (out_dir, out_dir))
+        bundle = f"bundle=/{Path(tmp.name).name}/job-1/generated_exam.bundle.json"
+        for cmd in commands:
+            self.assertIn(bundle, cmd)
+
+    def test_errors_from_both_compiles_reported(self):
+        failed = MagicMock(returncode=1, stderr=b"error: boom")
+        with (
+            patch("scripts.build_exam.subprocess.run", return_value=failed),
+            patch("builtins.print") as mock_print,
+        ):
+            self.assertEqual(generate_exam(specific_ids=["qn-test"]), (None, None))
+        printed = "\n".join(str(c.args[0]) for c in mock_print.call_args_list)
+        self.assertIn("Student Compile Failed", printed)
+        self.assertIn("Key Compile Failed", printed)
+
+    def test_typst_processes_capped(self):
+        lock = threading.Lock()
+        running = []
+        peak = []
+
+        def fake_run(cmd, **kwargs):
+            with lock:
+                running.append(cmd)
+                peak.append(len(running))
+            threading.Event().wait(0.05)
+            with lock:
+                running.remove(cmd)
+            return MagicMock(returncode=0)
+
+        jobs = [(str(i), Path(f"{i}.typ"), Path(f"{i}.pdf"), None) for i in range(4)]
+        with (
+            patch("scripts.build_exam._typst_slots", threading.BoundedSemaphore(2)),
+            patch("scripts.build_exam.subprocess.run", side_effect=fake_run),
+        ):
+            self.assertEqual(build_exam.compile_all(jobs, max_workers=4), {})
+        self.assertEqual(max(peak), 2)
+
+
+class TestBatchGeneration(unittest.TestCase):
+    """generate_batch builds N distinct variants from one DB."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.db = DBManager()
+        for i in range(6):
+            self.db.add_node(
+                Question(
+                    id=f"qn-{i}",
+                    topic="Calculus",
+                    year=2023,
+                    lecturer="L",
+                    given="g",
+                    to_prove="p",
+                )
+            )
+
+    def _batch(self, out, **kwargs):
+        with (
+            patch(
+                "scripts.build_exam.subprocess.run",
+                return_value=MagicMock(returncode=0),
+            ) as mock_run,
+            patch("builtins.print"),
+            patch.object(build_exam, "PROJECT_ROOT", Path(self.tmp.name)),
+        ):
+            results = generate_batch(
+                out_dir=Path(self.tmp.name) / out, db=self.db, **kwargs
+            )
+        return results, mock_run
+
+    def test_variants_distinct_and_compiled(self):
+        results, mock_run = self._batch("a", n=10, count=3, seed=7)
+        self.assertEqual(len(results), 10)
+        self.assertEqual(mock_run.call_count, 20)  # Student + key per variant
+
+        manifest = json.loads((Path(self.tmp.name) / "a" / "manifest.json").read_text())
+        sets = {frozenset(ids) for ids in manifest["variants"].values()}
+        self.assertEqual(len(sets), 10)
+
+    def test_seed_is_reproducible(self):
+        self._batch("a", n=5, count=2, seed=42)
+        self._batch("b", n=5, count=2, seed=42)
+
+        def manifest(out):
+            return (Path(self.tmp.name) / out / "manifest.json").read_text()
+
+        self.assertEqual(manifest("a"), manifest("b"))
+
+    def test_capped_at_number_of_distinct_sets(self):
+        results, _ = self._batch("a", n=100, count=5)
+        self.assertEqual(len(results), 6)  # C(6, 5)
+
+    def test_compiles_read_slim_bundle(self):
+        self.db.add_node(Definition(id="def-used", content="c"))
+        self.db.add_node(Definition(id="def-unused", content="c"))
+        self.db.questions["qn-0"].given = 'By #def("def-used"), ...'
+
+        results, mock_run = self._batch("a", n=1, count=6)
+        cmd = mock_run.call_args_list[0].args[0]
+        self.assertIn("--input", cmd)
+        bundle_arg = cmd[cmd.index("--input") + 1]
+        self.assertTrue(bundle_arg.startswith("bundle=/"))
+
+        bundle = json.loads(
+            (Path(self.tmp.name) / "a" / "variant_1.bundle.json").read_text()
+        )
+        self.assertEqual(len(bundle["questions"]), 6)
+        self.assertEqual([d["id"] for d in bundle["definitions"]], ["def-used"])
+
+
+class TestPreviewWatcher(unittest.TestCase):
+    """render_node_preview reuses one `typst watch` process."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = Path(self.tmp.name)
+        bin_dir = root / "bin"
+        bin_dir.mkdir()
+        fake = bin_dir / "typst"
+        fake.write_text(f"#!{sys.executable}\n" + FAKE_TYPST, encoding="utf-8")
+        fake.chmod(fake.stat().st_mode | stat.S_IEXEC)
+
+        patchers = [
+            patch.dict(
+                os.environ, {"PATH": f"{bin_dir}{os.pathsep}{os.environ['PATH']}"}
+            ),
+            patch.object(build_exam, "PROJECT_ROOT", root),
+            patch.object(build_exam, "_watcher", None),
+            patch.object(build_exam, "_watcher_unavailable", False),
+            patch.object(build_exam, "WATCH_TIMEOUT", 10),
+        ]
+        for p in patchers:
+            p.start()
+            self.addCleanup(p.stop)
+        self.addCleanup(self.tmp.cleanup)
+        self.addCleanup(lambda: build_exam._watcher and build_exam._watcher.stop())
+
+    def test_watcher_reused_across_previews(self):
+        with patch("scripts.build_exam.subprocess.run") as mock_run:
+            img_a, err_a = render_node_preview(Definition(id="def-a", content="A"))
+            watcher = build_exam._watcher
+            img_b, err_b = render_node_preview(Definition(id="def-b", content="B"))
+
+        mock_run.assert_not_called()
+        self.assertIsNone(err_a)
+        self.assertIsNone(err_b)
+        self.assertIs(build_exam._watcher, watcher)
+        self.assertIn('#def("def-a")', Path(img_a).read_text(encoding="utf-8"))
+        self.assertIn('#def("def-b")', Path(img_b).read_text(encoding="utf-8"))
+
+    def test_watcher_reports_compile_errors(self):
+        img, err = render_node_preview(Definition(id="BROKEN", content="x"))
+        self.assertIsNone(img)
+        self.assertIn("unknown variable: BROKEN", err)
+
+        # The watcher keeps running and recovers on the next preview
+        img, err = render_node_preview(Definition(id="def-ok", content="x"))
+        self.assertIsNone(err)
+        self.assertTrue(build_exam._watcher.alive())
+
+    def test_falls_back_to_one_shot_compile(self):
+        with patch.object(
+            build_exam.TypstWatcher, "start", side_effect=FileNotFoundError
+        ):
+            img, err = render_node_preview(Definition(id="def-a", content="A"))
+        self.assertIsNone(err)
+        self.assertTrue(Path(img).exists())
+        self.assertTrue(build_exam._watcher_unavailable)
+
+    def test_unchanged_node_served_from_cache(self):
+        node = Definition(id="def-a", content="A")
+        img, _ = render_node_preview(node)
+        with (
+            patch.object(build_exam.TypstWatcher, "render") as mock_render,
+            patch("scripts.build_exam.subprocess.run") as mock_run,
+        ):
+            cached, err = render_node_preview(Definition(id="def-a", content="A"))
+        mock_render.assert_not_called()
+        mock_run.assert_not_called()
+        self.assertEqual((cached, err), (img, None))
+
+        # Any change to the node's fields produces a new image
+        changed, _ = render_node_preview(Definition(id="def-a", content="A2"))
+        self.assertNotEqual(changed, img)
+
+    def test_journaled_edits_bypass_the_watcher(self):
+        data_dir = build_exam.PROJECT_ROOT / "data"
+        data_dir.mkdir()
+        db = DBManager(data_dir)
+        db.add_node(Definition(id="def-a", content="A"))
+        db.compact()
+        img, err = render_node_preview(db.definitions["def-a"], db)
+        self.assertIsNone(err)
+        self.assertIsNotNone(build_exam._watcher)  # data/*.yaml is current
+
+        # Only in the journal: the watcher would render the old YAML
+        db.update_node(Definition(id="def-a", content="A2"))
+        with patch.object(build_exam.TypstWatcher, "render") as mock_render:
+            changed, err = render_node_preview(db.definitions["def-a"], db)
+        mock_render.assert_not_called()
+        self.assertIsNone(err)
+        self.assertNotEqual(changed, img)
+
+    def test_cache_key_follows_the_data_files(self):
+        data_dir = build_exam.PROJECT_ROOT / "data"
+        data_dir.mkdir()
+        defs = data_dir / "definitions.yaml"
+        defs.write_text("- id: def-a\n  content: A\n", encoding="utf-8")
+        img, _ = render_node_preview(Definition(id="def-a", content="A"))
+
+        defs.write_text("- id: def-a\n  content: Changed\n", encoding="utf-8")
+        changed, _ = render_node_preview(Definition(id="def-a", content="A"))
+        self.assertNotEqual(changed, img)
+
+    def test_cache_evicts_least_recently_used(self):
+        preview_dir = build_exam.PROJECT_ROOT / "temp_previews"
+        preview_dir.mkdir()
+        for age, name in enumerate(["new", "mid", "old"]):
+            path = preview_dir / f"{name}.png"
+            path.write_bytes(b"x" * 100)
+            os.utime(path, ns=(0, 10**18 - age * 10**9))
+
+        build_exam._evict_previews(preview_dir, max_bytes=200)
+        self.assertEqual(
+            sorted(p.stem for p in preview_dir.glob("*.png")), ["mid", "new"]
+        )
+
+
 if __name__ == "__main__":
     unittest.main()
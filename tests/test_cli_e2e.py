@@ -15,6 +15,7 @@ EX_ID = "ex-auto-test"
 
 DEFINITION_YAML = DATA_PATH / "definitions.yaml"
 EXAMPLE_YAML = DATA_PATH / "examples.yaml"
+JOURNAL = DATA_PATH / ".journal.jsonl"
 # ---
 
 
@@ -26,7 +27,7 @@ class TestCliE2e(unittest.TestCase):
         This prevents the test from destroying existing data.
         """
         self.backed_up_files = {}
-        files_to_manage = [DEFINITION_YAML, EXAMPLE_YAML]
+        files_to_manage = [DEFINITION_YAML, EXAMPLE_YAML, JOURNAL]
 
         print("\nChecking for existing data files to back up...")
         for f_path in files_to_manage:
@@ -50,6 +51,9 @@ class TestCliE2e(unittest.TestCase):
         if EXAMPLE_YAML.exists():
             os.remove(EXAMPLE_YAML)
             print(f"  - Removed test file: {EXAMPLE_YAML.name}")
+        if JOURNAL.exists():
+            os.remove(JOURNAL)
+            print(f"  - Removed test file: {JOURNAL.name}")
 
         # Restore backups
         for original_path, backup_path in self.backed_up_files.items():
@@ -80,7 +84,8 @@ class TestCliE2e(unittest.TestCase):
         """
         # 1. Add a definition
         print("Step 1: Adding definition...")
-        add_def_input = f"{DEF_ID}\nAuto Term\nA test definition.\n\n"
+        # Prompts follow the field order: id, content (multi-line), term, name
+        add_def_input = f"{DEF_ID}\nA test definition.\n\nAuto Term\n\n"
         result = self.run_cli_command(["add", "definition"], input_text=add_def_input)
         self.assertEqual(
             result.returncode, 0, f"Failed to add definition. Stderr: {result.stderr}"
@@ -90,7 +95,8 @@ class TestCliE2e(unittest.TestCase):
 
         # 2. Add an example that references the definition
         print("Step 2: Adding example...")
-        add_ex_input = f"{EX_ID}\nAuto Example\nStandard\nSome content.\n\n{DEF_ID}\n"
+        # id, name, content (multi-line), type, related_definition_ids
+        add_ex_input = f"{EX_ID}\nAuto Example\nSome content.\n\nStandard\n{DEF_ID}\n"
         result = self.run_cli_command(["add", "example"], input_text=add_ex_input)
         self.assertEqual(
             result.returncode, 0, f"Failed to add example. Stderr: {result.stderr}"
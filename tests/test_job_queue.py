@@ -0,0 +1,146 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from scripts import job_queue
+from scripts.job_queue import DONE, FAILED, JobQueue
+
+
+class TestJobQueue(unittest.TestCase):
+    """Background jobs used by app.py for compiles and previews."""
+
+    def setUp(self):
+        self.queue = JobQueue(max_workers=2)
+        self.addCleanup(self.queue.shutdown)
+
+    def wait(self, job_id):
+        return self.wait_in(self.queue, job_id)
+
+    def wait_in(self, queue, job_id):
+        for _ in range(200):
+            job = queue.status(job_id)
+            if job.finished:
+                return job
+            threading.Event().wait(0.01)
+        self.fail(f"Job {job_id} did not finish")
+
+    def test_identical_in_flight_jobs_are_merged(self):
+        release = threading.Event()
+        calls = []
+
+        def compile_exam(ids, progress):
+            calls.append(ids)
+            release.wait(5)
+            progress(1, 2, "Student")
+            progress(2, 2, "Key")
+            return ids
+
+        first = self.queue.submit("exam", compile_exam, ["q-1"], key=("exam", "q-1"))
+        second = self.queue.submit("exam", compile_exam, ["q-1"], key=("exam", "q-1"))
+        other = self.queue.submit("exam", compile_exam, ["q-2"], key=("exam", "q-2"))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+
+        release.set()
+        job = self.wait(first)
+        self.assertEqual((job.status, job.result, job.progress), (DONE, ["q-1"], 1.0))
+        self.wait(other)
+        self.assertEqual(sorted(calls), [["q-1"], ["q-2"]])
+
+        # Once finished, the same key starts a new job
+        third = self.queue.submit("exam", compile_exam, ["q-1"], key=("exam", "q-1"))
+        self.assertNotEqual(third, first)
+        self.wait(third)
+
+    def test_failures_are_reported(self):
+        def broken(progress):
+            raise RuntimeError("typst missing")
+
+        job = self.wait(self.queue.submit("preview", broken))
+        self.assertEqual(job.status, FAILED)
+        self.assertIn("typst missing", job.error)
+        self.assertIsNone(self.queue.status("preview-unknown"))
+
+    def test_jobs_get_their_own_workspace(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        root = Path(tmp.name)
+        queue = JobQueue(workspace_root=root)
+        self.addCleanup(queue.shutdown)
+
+        def build(name, progress, workspace):
+            (workspace / "exam.pdf").write_text(name, encoding="utf-8")
+            return workspace / "exam.pdf"
+
+        stale = root / "exam-old"
+        stale.mkdir()
+        old = time.time() - job_queue.JOB_TTL_S - 1
+        os.utime(stale, (old, old))
+
+        jobs = [
+            self.wait_in(queue, queue.submit("exam", build, n, workspace=True))
+            for n in ("a", "b")
+        ]
+        self.assertNotEqual(jobs[0].workspace, jobs[1].workspace)
+        self.assertEqual(
+            [j.result.read_text(encoding="utf-8") for j in jobs], ["a", "b"]
+        )
+        self.assertFalse(stale.exists())  # Expired workspaces are cleaned up
+
+        with patch.object(job_queue, "MAX_WORKSPACES", 2):
+            self.wait_in(queue, queue.submit("exam", build, "c", workspace=True))
+        self.assertEqual(len(list(root.iterdir())), 2)  # Oldest one dropped
+
+        with self.assertRaises(ValueError):
+            self.queue.submit("exam", build, "d", workspace=True)
+
+    def test_running_workspaces_are_never_pruned(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        queue = JobQueue(workspace_root=Path(tmp.name))
+        self.addCleanup(queue.shutdown)
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def build(progress, workspace):
+            release.wait(5)
+            return workspace.exists()
+
+        with patch.object(job_queue, "MAX_WORKSPACES", 2):
+            # No key, so it is not merged with anything, but still running
+            running = queue.submit("exam", build, workspace=True)
+            others = [queue.submit("exam", build, workspace=True) for _ in range(3)]
+        release.set()
+        self.assertTrue(self.wait_in(queue, running).result)
+        for job_id in others:
+            self.assertTrue(self.wait_in(queue, job_id).result)
+
+    def test_jobs_are_finished_only_once_finished_at_is_set(self):
+        # Pruning compares finished_at of every finished job, so the worker
+        # stamps it before the status flips
+        seen = []
+
+        def stamp():
+            if threading.current_thread() is not threading.main_thread():
+                seen.extend(job.finished for job in self.queue._jobs.values())
+            return time.time()
+
+        def quick(progress):
+            return "ok"
+
+        with patch.object(job_queue, "time", SimpleNamespace(time=stamp)):
+            job = self.wait(self.queue.submit("preview", quick))
+        self.assertEqual(seen, [False])
+        self.assertIsNotNone(job.finished_at)
+
+
+if __name__ == "__main__":
+    unittest.main()
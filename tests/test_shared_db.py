@@ -0,0 +1,100 @@
+import tempfile
+import threading
+import time
+import unittest
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from scripts.db_manager import DBManager
+from scripts.models import Definition, Example, Tool
+from scripts.shared_db import RWLock, SharedDB
+
+
+class TestRWLock(unittest.TestCase):
+    def test_readers_share_writers_exclude(self):
+        lock = RWLock()
+        events = []
+
+        def writer():
+            with lock.write():
+                events.append("write")
+
+        with lock.read(), lock.read():  # Readers do not block each other
+            thread = threading.Thread(target=writer)
+            thread.start()
+            time.sleep(0.05)
+            events.append("read done")
+        thread.join(timeout=1)
+        self.assertEqual(events, ["read done", "write"])
+
+
+class TestSharedDB(unittest.TestCase):
+    """The process-wide bank used by app.py, reloaded per changed file."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.data_dir = Path(self.tmp.name)
+        editor = DBManager(self.data_dir)
+        editor.add_node(Definition(id="def-a", term="Alpha", content="..."))
+        editor.add_node(Tool(id="tool-a", name="Hammer"))
+        editor.compact()
+        self.shared = SharedDB(self.data_dir, watch=False)
+
+    def tearDown(self):
+        self.shared.stop()
+        self.tmp.cleanup()
+
+    def test_only_the_changed_file_is_reloaded(self):
+        with self.shared.read() as db:
+            tool = db.tools["tool-a"]
+
+        # Another process edits the bank
+        editor = DBManager(self.data_dir)
+        editor.update_node(Definition(id="def-a", term="Beta", content="..."))
+        editor.compact()
+        self.shared.notify(self.data_dir / "definitions.yaml")
+        self.shared.flush()
+
+        with self.shared.read() as db:
+            self.assertEqual(db.definitions["def-a"].term, "Beta")
+            self.assertEqual([n.id for n in db.search("beta")], ["def-a"])
+            self.assertEqual(db.search("alpha"), [])
+            self.assertIs(db.tools["tool-a"], tool)  # Untouched type kept as is
+            self.assertEqual(db.dirty, set())
+
+    def test_changed_paths_map_to_node_types(self):
+        types_for = self.shared.node_types_for
+        self.assertEqual(types_for(self.data_dir / "tools.yaml"), {Tool})
+        self.assertEqual(types_for(self.data_dir / "examples" / "ex-1.yaml"), {Example})
+        self.assertEqual(types_for(self.data_dir / ".cache" / "tools.pickle"), set())
+        self.assertEqual(types_for(self.data_dir / ".tools.yaml.123.tmp"), set())
+
+    def test_journal_appends_reload_only_their_types(self):
+        with self.shared.read() as db:
+            tool, definition = db.tools["tool-a"], db.definitions["def-a"]
+
+        # Another process journals an edit without compacting
+        editor = DBManager(self.data_dir)
+        editor.add_node(Definition(id="def-b", term="Beta", content="..."))
+        self.shared.notify(self.data_dir / ".journal.jsonl")
+        with patch.object(self.shared, "reload", wraps=self.shared.reload) as reload:
+            self.shared.flush()
+        reload.assert_called_once_with({Definition})
+
+        with self.shared.read() as db:
+            self.assertEqual([n.id for n in db.search("beta")], ["def-b"])
+            self.assertIs(db.tools["tool-a"], tool)
+            self.assertIs(db.definitions["def-a"], definition)  # Unchanged node kept
+
+        # Entries already seen reload nothing
+        self.shared.notify(self.data_dir / ".journal.jsonl")
+        with patch.object(self.shared, "reload") as reload:
+            self.shared.flush()
+        reload.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import tempfile
+import unittest
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from scripts.db_manager import DBManager
+from scripts.models import AnswerStep, Definition, Example, Question
+from scripts.sqlite_backend import SQLiteDBManager, export_yaml, import_yaml
+
+
+class TestSQLiteBackend(unittest.TestCase):
+    """SQLiteDBManager behaves like DBManager, across separate connections."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_file = Path(self.tmp.name) / "bank.sqlite"
+        self.db = SQLiteDBManager(self.db_file)
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def reopen(self):
+        self.db.close()
+        self.db = SQLiteDBManager(self.db_file)
+        return self.db
+
+    def test_round_trip(self):
+        q = Question(
+            id="q-1",
+            year=2023,
+            lecturer="X",
+            topic="Limits",
+            given='Uses #def("def-a").',
+            to_prove="...",
+            answer_steps=[AnswerStep(type="Proof", title="S", content="$x$")],
+            tools=["tool-b", "tool-a"],
+        )
+        self.db.add_node(Definition(id="def-a", term="A", content="..."))
+        self.db.add_node(q)
+
+        db = self.reopen()
+        self.assertEqual(db.questions["q-1"], q)  # List order and steps survive
+        self.assertEqual(db.referrers("def-a"), [("q-1", "given")])
+        self.assertEqual([n.id for n in db.query_questions(tool="tool-a")], ["q-1"])
+
+    def test_integrity_checked_in_the_database(self):
+        self.db.add_node(Definition(id="def-a", term="A", content="..."))
+        # A second editor adds a reference this instance has not seen
+        other = SQLiteDBManager(self.db_file)
+        other.add_node(
+            Example(
+                id="ex-1", name="E", content="...", related_definition_ids=["def-a"]
+            )
+        )
+        other.close()
+
+        with self.assertRaisesRegex(ValueError, "referenced by node 'ex-1'"):
+            self.db.delete_node("def-a")
+        with self.assertRaisesRegex(ValueError, "already exists"):
+            self.db.add_node(Definition(id="ex-1", term="dup", content="..."))
+
+        self.db.update_node(Example(id="ex-1", name="E", content="..."))
+        self.db.delete_node("def-a")
+        self.assertEqual(sorted(self.reopen().nodes), ["ex-1"])
+
+    def test_yaml_import_export(self):
+        data_dir = Path(self.tmp.name) / "data"
+        data_dir.mkdir()
+        source = DBManager(data_dir)
+        source.add_node(Definition(id="def-a", term="A", content="$x$"))
+        source.add_node(
+            Example(
+                id="ex-1", name="E", content="...", related_definition_ids=["def-a"]
+            )
+        )
+        source.compact()
+
+        self.assertEqual(import_yaml(data_dir, self.db_file), 2)
+        self.assertEqual(
+            self.reopen().referrers("def-a"), [("ex-1", "related_definition_ids")]
+        )
+
+        (data_dir / "definitions.yaml").unlink()
+        self.assertEqual(export_yaml(self.db_file, data_dir), 2)
+        self.assertEqual(DBManager(data_dir).definitions["def-a"].content, "$x$")
+
+
+if __name__ == "__main__":
+    unittest.main()
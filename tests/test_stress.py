@@ -57,8 +57,8 @@ def stress_test():
     print("1. Adding 50 Definitions...", end=" ", flush=True)
     for i in range(ITERATIONS):
         def_id = f"def-stress-{i}"
-        # Inputs: ID, Term, Content (note the extra \n to finish content)
-        inputs = f"{def_id}\nStress Term {i}\nStress Content {i}\n\n"
+        # Inputs in field order: ID, Content (the extra \n finishes it), Term, Name
+        inputs = f"{def_id}\nStress Content {i}\n\nStress Term {i}\n\n"
         res = run_cli(["add", "definition"], inputs)
 
         if res.returncode != 0:
@@ -74,8 +74,8 @@ def stress_test():
     for i in range(ITERATIONS):
         ex_id = f"ex-stress-{i}"
         def_id = f"def-stress-{i}"
-        # Inputs: ID, Name, Type, Content, Def_IDs
-        inputs = f"{ex_id}\nStress Ex {i}\nStandard\nContent {i}\n\n{def_id}\n"
+        # Inputs in field order: ID, Name, Content, Type, Def_IDs
+        inputs = f"{ex_id}\nStress Ex {i}\nContent {i}\n\nStandard\n{def_id}\n"
         res = run_cli(["add", "example"], inputs)
 
         if res.returncode != 0:
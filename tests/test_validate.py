@@ -0,0 +1,76 @@
+import json
+import tempfile
+import unittest
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from scripts.db_manager import DBManager
+from scripts.models import Definition, Example
+from scripts.validate import EXIT_FAILED, EXIT_OK, EXIT_PROBLEMS, exit_code, validate
+
+
+class TestValidate(unittest.TestCase):
+    """The validation engine behind audit_data.py and check_integrity.py."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.data_dir = Path(self.tmp.name)
+        db = DBManager(self.data_dir)
+        db.add_node(Definition(id="def-a", term="A", content="$x$"))
+        db.add_node(
+            Example(
+                id="ex-1",
+                name="E",
+                content='See #def("def-a").',
+                related_definition_ids=["def-a"],
+            )
+        )
+        db.compact()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def checks(self, report):
+        return sorted((i["check"], i["id"] or "") for i in report["issues"])
+
+    def test_valid_bank(self):
+        report = validate(self.data_dir)
+        self.assertTrue(report["ok"])
+        self.assertEqual(report["counts"], {"definitions": 1, "examples": 1})
+        self.assertEqual(exit_code(report), EXIT_OK)
+        json.dumps(report)  # The report is printed as JSON by --json
+
+    def test_problems_are_reported_in_parallel(self):
+        with open(self.data_dir / "tools.yaml", "w", encoding="utf-8") as f:
+            f.write("- id: def-a\n- id: tool-x\n  colour: red\n- name: no id\n")
+        with open(self.data_dir / "mistakes.yaml", "w", encoding="utf-8") as f:
+            f.write(
+                "- id: mis-1\n  description: 'Uses #tool(\"tool-gone\").'\n"
+                "- id: mis-2\n"
+            )
+
+        for jobs in (1, 2):
+            report = validate(self.data_dir, jobs=jobs)
+            self.assertEqual(report["workers"], jobs)
+            self.assertEqual(
+                self.checks(report),
+                [
+                    ("broken-reference", "mis-1"),
+                    ("duplicate-id", "def-a"),
+                    ("schema", ""),
+                    ("schema", "mis-2"),
+                    ("unknown-field", "tool-x"),
+                ],
+            )
+            self.assertEqual(exit_code(report), EXIT_PROBLEMS)
+            self.assertEqual(exit_code(report, ("read",)), EXIT_OK)
+
+    def test_missing_data_directory(self):
+        report = validate(self.data_dir / "missing")
+        self.assertEqual(exit_code(report), EXIT_FAILED)
+
+
+if __name__ == "__main__":
+    unittest.main()